@@ -0,0 +1,246 @@
+"""Compressed audit log: JSONL entries stored in indexed zstd frames."""
+
+import atexit
+import json
+import os
+import struct
+import sys
+import time
+import weakref
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+from . import jsonutil
+
+try:
+    import zstandard
+except ImportError:  # Optional dependency, see the "zstd" extra
+    zstandard = None
+
+# Entries are compressed into one zstd frame once any of these is reached
+FRAME_MAX_ENTRIES = 1024
+FRAME_MAX_BYTES = 1 << 20
+FRAME_MAX_AGE = 1.0  # Seconds since the first entry of the frame
+
+# Every data frame is preceded by a zstd skippable frame holding its index
+# entry (JSON): compressed length, entry count, timestamps, servers, methods.
+# Decompressors skip these frames, so the file stays a valid zstd stream.
+_SKIPPABLE_MAGIC = 0x184D2A50
+_FRAME_HEADER = struct.Struct("<II")
+
+
+def compressed_path(audit_log: Path) -> Path:
+    """
+    Get the path of the compressed audit log.
+
+    Args:
+        audit_log: Configured audit log path
+
+    Returns:
+        The audit log path with ".zst" appended
+    """
+    return audit_log.with_name(audit_log.name + ".zst")
+
+
+# Writers that may still hold waiting entries, written out at exit. The
+# references are weak, so writers that are no longer used aren't kept alive.
+_open_writers: "weakref.WeakSet[ZstdAuditWriter]" = weakref.WeakSet()
+
+
+def _flush_open_writers():
+    """Write the entries waiting in all open writers."""
+    for writer in list(_open_writers):
+        try:
+            writer.flush()
+        except Exception as e:
+            print(f"Error writing to {writer.path}: {e}", file=sys.stderr)
+
+
+atexit.register(_flush_open_writers)
+
+
+class ZstdAuditWriter:
+    """Appends audit entries to a compressed audit log."""
+
+    def __init__(self, path: Path, level: int = 3):
+        """
+        Initialize the writer.
+
+        Args:
+            path: Compressed audit log to append to
+            level: zstd compression level
+        """
+        self.path = path
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._lines: list[bytes] = []
+        self._size = 0
+        self._started = 0.0
+        self._timestamps: list[str] = []
+        self._servers: set[str | None] = set()
+        self._methods: set[str | None] = set()
+        _open_writers.add(self)
+
+    def write(self, entry: dict[str, Any]):
+        """
+        Add an entry, writing a frame if enough entries are waiting.
+
+        Args:
+            entry: Audit entry
+        """
+        line = jsonutil.dumps(entry) + b"\n"
+        if not self._lines:
+            self._started = time.monotonic()
+        self._lines.append(line)
+        self._size += len(line)
+        if "timestamp" in entry:
+            self._timestamps.append(entry["timestamp"])
+        self._servers.add(entry.get("server"))
+        self._methods.add(entry.get("method"))
+
+        if (
+            len(self._lines) >= FRAME_MAX_ENTRIES
+            or self._size >= FRAME_MAX_BYTES
+            or time.monotonic() - self._started >= FRAME_MAX_AGE
+        ):
+            self.flush()
+
+    def flush_due_in(self) -> float | None:
+        """
+        Get the time until the waiting entries are due to be written.
+
+        Returns:
+            Seconds until the frame reaches FRAME_MAX_AGE (0 if it has), or
+            None if no entries are waiting
+        """
+        if not self._lines:
+            return None
+        return max(0.0, self._started + FRAME_MAX_AGE - time.monotonic())
+
+    def flush_if_due(self):
+        """Write the waiting entries if the frame has reached FRAME_MAX_AGE."""
+        if self.flush_due_in() == 0.0:
+            self.flush()
+
+    def flush(self):
+        """Write the waiting entries as one frame."""
+        if not self._lines:
+            return
+
+        frame = self._compressor.compress(b"".join(self._lines))
+        index = {
+            "length": len(frame),
+            "entries": len(self._lines),
+            "first_timestamp": min(self._timestamps, default=None),
+            "last_timestamp": max(self._timestamps, default=None),
+            "servers": list(self._servers),
+            "methods": list(self._methods),
+        }
+        metadata = json.dumps(index).encode("utf-8")
+        data = _FRAME_HEADER.pack(_SKIPPABLE_MAGIC, len(metadata)) + metadata + frame
+
+        self._lines.clear()
+        self._size = 0
+        self._timestamps.clear()
+        self._servers.clear()
+        self._methods.clear()
+
+        # Several gateways may share the audit log, so each index entry and
+        # its frame are appended with a single write
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view) :]
+        finally:
+            os.close(fd)
+
+    def close(self):
+        """Write any waiting entries."""
+        _open_writers.discard(self)
+        self.flush()
+
+    def __del__(self):
+        # A writer dropped without being closed still writes its entries
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+def read_index(path: Path) -> list[tuple[int, dict[str, Any]]]:
+    """
+    Read the index entries of a compressed audit log.
+
+    Only the small index frames are read; data frames are skipped over.
+    A frame cut short (e.g. by a full disk) ends the index.
+
+    Args:
+        path: Compressed audit log
+
+    Returns:
+        List of (data frame offset, index entry) tuples, in file order
+
+    Raises:
+        ValueError: If the file is not a compressed audit log
+    """
+    frames = []
+    with open(path, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        pos = 0
+        while pos + _FRAME_HEADER.size <= file_size:
+            f.seek(pos)
+            magic, size = _FRAME_HEADER.unpack(f.read(_FRAME_HEADER.size))
+            if magic != _SKIPPABLE_MAGIC:
+                raise ValueError(f"Not a compressed audit log (offset {pos}): {path}")
+            offset = pos + _FRAME_HEADER.size + size
+            if offset > file_size:
+                break
+            index = json.loads(f.read(size))
+            if offset + index["length"] > file_size:
+                break
+            frames.append((offset, index))
+            pos = offset + index["length"]
+    return frames
+
+
+def iter_lines_reversed(
+    path: Path,
+    server: str | None = None,
+    method: str | None = None,
+) -> Iterator[bytes]:
+    """
+    Read the entries of a compressed audit log from last to first.
+
+    Frames whose index shows they hold no entry for the given server or
+    method are not decompressed. Entries of the remaining frames still need
+    to be filtered by the caller.
+
+    Args:
+        path: Compressed audit log
+        server: Only read frames with entries for this server
+        method: Only read frames with entries for this method
+
+    Yields:
+        JSON lines without their trailing newline, last entry first
+
+    Raises:
+        ValueError: If the file is not a compressed audit log or a frame is damaged
+    """
+    decompressor = zstandard.ZstdDecompressor()
+    with open(path, "rb") as f:
+        for offset, index in reversed(read_index(path)):
+            if server is not None and server not in index["servers"]:
+                continue
+            if method is not None and method not in index["methods"]:
+                continue
+
+            f.seek(offset)
+            try:
+                data = decompressor.decompressobj().decompress(f.read(index["length"]))
+            except zstandard.ZstdError as e:
+                raise ValueError(f"Damaged frame (offset {offset}): {path}: {e}") from e
+            lines = data.split(b"\n")
+            if not lines[-1]:
+                lines.pop()
+            yield from reversed(lines)
@@ -3,10 +3,68 @@
 import argparse
 import json
 import sys
+from collections.abc import Iterator
 from pathlib import Path
 
-from .config import DEFAULT_SCAN_RULES, GatewayConfig
-from .gateway import run_gateway
+from . import jsonutil
+
+# Importing config pulls in pydantic, which dominates CLI startup time, so
+# commands import it (and the gateway) only when they need it.
+
+# Number of bytes read at a time when reading a log file backwards
+TAIL_CHUNK_SIZE = 65536
+
+
+def _iter_lines_reversed(path: Path) -> Iterator[bytes]:
+    """
+    Read the lines of a file from last to first.
+
+    The file is read backwards in chunks, so showing the end of a large log
+    only reads as much of it as needed.
+
+    Args:
+        path: File to read
+
+    Yields:
+        Lines without their trailing newline, last line first
+    """
+    with open(path, "rb") as f:
+        pos = f.seek(0, 2)
+        rest = b""
+        skip_empty = True  # A final newline doesn't start another line
+        while pos > 0:
+            size = min(TAIL_CHUNK_SIZE, pos)
+            pos -= size
+            f.seek(pos)
+            lines = (f.read(size) + rest).split(b"\n")
+            rest = lines[0]
+            for line in reversed(lines[1:]):
+                if not (skip_empty and not line):
+                    yield line
+                skip_empty = False
+        if rest or not skip_empty:
+            yield rest
+
+
+def _tail_lines(path: Path, n: int) -> list[bytes]:
+    """
+    Get the last lines of a file.
+
+    Args:
+        path: File to read
+        n: Number of lines
+
+    Returns:
+        Up to n lines without their trailing newline, in file order
+    """
+    lines = []
+    if n > 0:
+        for line in _iter_lines_reversed(path):
+            lines.append(line)
+            if len(lines) == n:
+                break
+    lines.reverse()
+    return lines
 
 
 def cmd_stdio(args):
@@ -15,6 +73,9 @@ def cmd_stdio(args):
         print("Error: No server command specified", file=sys.stderr)
         sys.exit(1)
 
+    from .config import GatewayConfig
+    from .gateway import run_gateway
+
     # Load configuration
     config_path = args.config
     if config_path:
@@ -31,6 +92,8 @@ def cmd_stdio(args):
 
 def cmd_config_init(args):
     """Initialize default configuration."""
+    from .config import DEFAULT_SCAN_RULES, GatewayConfig
+
     config_path = Path(args.output) if args.output else GatewayConfig.get_default_config_path()
 
     if config_path.exists() and not args.force:
@@ -46,15 +109,16 @@ def cmd_config_init(args):
     config.scanning.rules = DEFAULT_SCAN_RULES
 
     # Write to file
-    config_dict = json.loads(config.model_dump_json())
-    with open(config_path, "w") as f:
-        json.dump(config_dict, f, indent=2)
+    with open(config_path, "wb") as f:
+        f.write(jsonutil.dumps(config.model_dump(mode="json"), indent=True))
 
     print(f"Configuration initialized at: {config_path}")
 
 
 def cmd_config_validate(args):
     """Validate configuration file."""
+    from .config import GatewayConfig
+
     config_path = Path(args.config)
 
     if not config_path.exists():
@@ -75,6 +139,8 @@ def cmd_config_validate(args):
 
 def cmd_config_show(args):
     """Show current configuration."""
+    from .config import GatewayConfig
+
     if args.config:
         config_path = Path(args.config)
     else:
@@ -86,7 +152,7 @@ def cmd_config_show(args):
         sys.exit(1)
 
     config = GatewayConfig.load_from_file(config_path)
-    print(config.model_dump_json(indent=2))
+    print(jsonutil.dumps(config.model_dump(mode="json"), indent=True).decode("utf-8"))
 
 
 def cmd_install(args):
@@ -112,6 +178,8 @@ def cmd_install(args):
 
 def cmd_logs(args):
     """View gateway logs."""
+    from .config import GatewayConfig
+
     config = GatewayConfig.load_or_create_default()
     log_dir = config.logging.destination
 
@@ -143,76 +211,76 @@ def cmd_logs(args):
                     time.sleep(0.1)
         else:
             # Show last N lines
-            lines = f.readlines()
-            start = max(0, len(lines) - args.lines)
-            for line in lines[start:]:
-                print(line.rstrip())
+            for line in _tail_lines(log_file, args.lines):
+                print(line.decode("utf-8", errors="replace").rstrip())
 
 
 def cmd_audit(args):
     """View audit logs."""
+    from .config import GatewayConfig
+
     config = GatewayConfig.load_or_create_default()
     audit_log = config.auditing.audit_log
 
+    if config.auditing.compression == "zstd":
+        from . import auditlog
+
+        if auditlog.zstandard is None:
+            print("Error: reading a compressed audit log requires zstandard", file=sys.stderr)
+            sys.exit(1)
+        audit_log = auditlog.compressed_path(audit_log)
+        # Frames without entries for the server/method are skipped
+        lines_reversed = auditlog.iter_lines_reversed(
+            audit_log, server=args.server, method=args.method
+        )
+    else:
+        lines_reversed = _iter_lines_reversed(audit_log)
+
     if not audit_log.exists():
         print(f"No audit log found at: {audit_log}", file=sys.stderr)
         sys.exit(1)
 
     print(f"Showing audit log from: {audit_log}\n")
 
-    # Read and display audit entries
-    with open(audit_log) as f:
-        lines = f.readlines()
-
-        # Filter if requested
-        if args.server or args.method:
-            filtered = []
-            for line in lines:
-                try:
-                    entry = json.loads(line)
+    # Find the last N (matching) entries, reading from the end of the log
+    lines = []
+    try:
+        if args.lines > 0:
+            for line in lines_reversed:
+                if args.server or args.method:
+                    try:
+                        entry = jsonutil.loads(line)
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        continue
                     if args.server and entry.get("server") != args.server:
                         continue
                     if args.method and entry.get("method") != args.method:
                         continue
-                    filtered.append(line)
-                except json.JSONDecodeError:
-                    continue
-            lines = filtered
-
-        # Show last N lines
-        start = max(0, len(lines) - args.lines)
-        for line in lines[start:]:
-            # Pretty print if requested
-            if args.pretty:
-                try:
-                    entry = json.loads(line)
-                    print(json.dumps(entry, indent=2))
-                    print("-" * 80)
-                except json.JSONDecodeError:
-                    print(line.rstrip())
-            else:
+                lines.append(line)
+                if len(lines) == args.lines:
+                    break
+    except ValueError as e:
+        # e.g. a compressed log that is damaged or was written by something else
+        print(f"Error reading audit log: {e}", file=sys.stderr)
+        sys.exit(1)
+    lines.reverse()
+
+    for line in lines:
+        line = line.decode("utf-8", errors="replace")
+        # Pretty print if requested
+        if args.pretty:
+            try:
+                entry = jsonutil.loads(line)
+                print(jsonutil.dumps(entry, indent=True).decode("utf-8"))
+                print("-" * 80)
+            except json.JSONDecodeError:
                 print(line.rstrip())
+        else:
+            print(line.rstrip())
 
 
-def main():
-    """Main CLI entry point."""
-    parser = argparse.ArgumentParser(
-        description="MCP Gateway - Security gateway for Model Context Protocol traffic",
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-    )
-    parser.add_argument(
-        "--version",
-        action="version",
-        version="mcp-gateway 0.1.0",
-    )
-
-    subparsers = parser.add_subparsers(dest="command", help="Command to run")
-
-    # stdio command
-    stdio_parser = subparsers.add_parser(
-        "stdio",
-        help="Run stdio gateway wrapper",
-    )
+def _configure_stdio_parser(stdio_parser: argparse.ArgumentParser):
+    """Add arguments for the stdio command."""
     stdio_parser.add_argument(
         "--config",
         type=str,
@@ -230,8 +298,9 @@ def main():
     )
     stdio_parser.set_defaults(func=cmd_stdio)
 
-    # config commands
-    config_parser = subparsers.add_parser("config", help="Configuration management")
+
+def _configure_config_parser(config_parser: argparse.ArgumentParser):
+    """Add the config subcommands."""
     config_subparsers = config_parser.add_subparsers(dest="config_command")
 
     # config init
@@ -268,15 +337,14 @@ def main():
     )
     config_show_parser.set_defaults(func=cmd_config_show)
 
-    # install command
-    install_parser = subparsers.add_parser(
-        "install",
-        help="Install gateway wrapper for MCP servers",
-    )
+
+def _configure_install_parser(install_parser: argparse.ArgumentParser):
+    """Add arguments for the install command."""
     install_parser.set_defaults(func=cmd_install)
 
-    # logs command
-    logs_parser = subparsers.add_parser("logs", help="View gateway logs")
+
+def _configure_logs_parser(logs_parser: argparse.ArgumentParser):
+    """Add arguments for the logs command."""
     logs_parser.add_argument(
         "--follow",
         "-f",
@@ -292,8 +360,9 @@ def main():
     )
     logs_parser.set_defaults(func=cmd_logs)
 
-    # audit command
-    audit_parser = subparsers.add_parser("audit", help="View audit logs")
+
+def _configure_audit_parser(audit_parser: argparse.ArgumentParser):
+    """Add arguments for the audit command."""
     audit_parser.add_argument(
         "--server",
         type=str,
@@ -318,6 +387,51 @@ def main():
     )
     audit_parser.set_defaults(func=cmd_audit)
 
+
+# Subcommand name -> (help text, function adding its arguments)
+COMMANDS = {
+    "stdio": ("Run stdio gateway wrapper", _configure_stdio_parser),
+    "config": ("Configuration management", _configure_config_parser),
+    "install": ("Install gateway wrapper for MCP servers", _configure_install_parser),
+    "logs": ("View gateway logs", _configure_logs_parser),
+    "audit": ("View audit logs", _configure_audit_parser),
+}
+
+
+def _find_command(argv: list[str]) -> str | None:
+    """Get the subcommand named on the command line, if any."""
+    # The top-level options (--help, --version) take no values, so the
+    # first positional argument is the subcommand
+    for arg in argv:
+        if not arg.startswith("-"):
+            return arg
+    return None
+
+
+def main():
+    """Main CLI entry point."""
+    parser = argparse.ArgumentParser(
+        description="MCP Gateway - Security gateway for Model Context Protocol traffic",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--version",
+        action="version",
+        version="mcp-gateway 0.1.0",
+    )
+
+    subparsers = parser.add_subparsers(dest="command", help="Command to run")
+
+    # Every subcommand is registered so it shows up in --help, but only the
+    # one being run gets its arguments (and nested subcommands) built
+    requested = _find_command(sys.argv[1:])
+    command_parsers = {}
+    for name, (help_text, configure) in COMMANDS.items():
+        command_parser = subparsers.add_parser(name, help=help_text)
+        if name == requested:
+            configure(command_parser)
+        command_parsers[name] = command_parser
+
     # Parse arguments
     args = parser.parse_args()
 
@@ -327,7 +441,7 @@ def main():
 
     # Handle config subcommands
     if args.command == "config" and not hasattr(args, "func"):
-        config_parser.print_help()
+        command_parsers["config"].print_help()
         sys.exit(1)
 
     # Run the command
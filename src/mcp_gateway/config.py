@@ -1,12 +1,19 @@
 """Configuration schema for MCP Gateway."""
 
+import functools
+import json
 import os
+import re
 from enum import Enum
 from pathlib import Path
-from typing import Any
+from typing import Any, Literal
 
-from pydantic import BaseModel, Field, field_validator
-from pydantic_settings import BaseSettings, SettingsConfigDict
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, field_validator
+
+# Fields of GatewayConfig can be set with environment variables (or in a
+# .env file in the working directory) named after them, holding JSON
+ENV_PREFIX = "MCP_GATEWAY_"
+ENV_FILE = ".env"
 
 
 class LogLevel(str, Enum):
@@ -27,6 +34,14 @@ class ActionType(str, Enum):
     REDACT = "redact"
 
 
+class ScanDirection(str, Enum):
+    """Message directions a rule applies to."""
+
+    BOTH = "both"
+    REQUEST = "client->server"
+    RESPONSE = "server->client"
+
+
 class Severity(str, Enum):
     """Severity levels for security findings."""
 
@@ -62,6 +77,7 @@ class AuditConfig(BaseModel):
     )
     include_message_content: bool = True
     include_timestamps: bool = True
+    compression: Literal["none", "zstd"] = "none"  # zstd is written to <audit_log>.zst
 
     @field_validator("audit_log", mode="before")
     @classmethod
@@ -80,8 +96,33 @@ class ScanRule(BaseModel):
     pattern: str  # Regular expression pattern
     action: ActionType = ActionType.LOG
     severity: Severity = Severity.MEDIUM
+    direction: ScanDirection = ScanDirection.BOTH
     enabled: bool = True
 
+    _compiled: re.Pattern = PrivateAttr()
+
+    @field_validator("pattern")
+    @classmethod
+    def validate_pattern(cls, v: str) -> str:
+        """Reject patterns that are not valid regular expressions."""
+        try:
+            re.compile(v, re.IGNORECASE)
+        except re.error as e:
+            raise ValueError(f"invalid regular expression: {e}") from e
+        return v
+
+    def model_post_init(self, __context: Any) -> None:
+        """Compile the pattern once when the rule is loaded."""
+        self._compiled = re.compile(self.pattern, re.IGNORECASE)
+
+    @property
+    def compiled(self) -> re.Pattern:
+        """Get the compiled (case-insensitive) pattern."""
+        if self._compiled.pattern != self.pattern:
+            # Pattern was reassigned after the rule was created
+            self._compiled = re.compile(self.pattern, re.IGNORECASE)
+        return self._compiled
+
 
 class ScanningConfig(BaseModel):
     """Security scanning configuration."""
@@ -109,15 +150,15 @@ class MetricsConfig(BaseModel):
     collect_violation_counts: bool = True
 
 
-class GatewayConfig(BaseSettings):
-    """Main gateway configuration."""
+class GatewayConfig(BaseModel):
+    """
+    Main gateway configuration.
 
-    model_config = SettingsConfigDict(
-        env_prefix="MCP_GATEWAY_",
-        env_file=".env",
-        env_file_encoding="utf-8",
-        case_sensitive=False,
-    )
+    Settings from the environment are merged into the given values, e.g.
+    MCP_GATEWAY_METRICS='{"enabled": false}' disables metrics.
+    """
+
+    model_config = ConfigDict(extra="forbid", validate_default=True)
 
     logging: LoggingConfig = Field(default_factory=LoggingConfig)
     auditing: AuditConfig = Field(default_factory=AuditConfig)
@@ -125,14 +166,33 @@ class GatewayConfig(BaseSettings):
     alerting: AlertingConfig = Field(default_factory=AlertingConfig)
     metrics: MetricsConfig = Field(default_factory=MetricsConfig)
 
+    def __init__(self, **data: Any):
+        """
+        Create a configuration.
+
+        Args:
+            **data: Field values, taking precedence over environment variables,
+                which take precedence over the .env file
+
+        Raises:
+            ValueError: If an environment setting is not valid JSON
+        """
+        settings = _deep_update(_read_env_file(ENV_FILE), _read_env(os.environ))
+        super().__init__(**_deep_update(settings, data))
+
     @classmethod
     def load_from_file(cls, config_path: Path) -> "GatewayConfig":
-        """Load configuration from a JSON file."""
-        import json
-
-        with open(config_path) as f:
-            config_data = json.load(f)
-        return cls(**config_data)
+        """
+        Load configuration from a JSON file.
+
+        Files are only parsed and validated again once they (or the
+        environment) change. Every call returns a new, independent copy.
+        """
+        stat = os.stat(config_path)
+        config = _load_config_file(
+            cls, os.fspath(config_path), stat.st_mtime_ns, stat.st_size, _settings_key()
+        )
+        return config.model_copy(deep=True)
 
     @classmethod
     def get_default_config_path(cls) -> Path:
@@ -148,6 +208,125 @@ class GatewayConfig(BaseSettings):
         return cls()
 
 
+@functools.lru_cache(maxsize=32)
+def _load_config_file(
+    cls: type[GatewayConfig], path: str, mtime_ns: int, size: int, settings_key: tuple
+) -> GatewayConfig:
+    """
+    Load and validate a configuration file.
+
+    Args:
+        cls: Configuration class to create
+        path: Path to the JSON file
+        mtime_ns: Modification time of the file (cache key only)
+        size: Size of the file (cache key only)
+        settings_key: Result of _settings_key() (cache key only)
+
+    Returns:
+        Loaded configuration, shared by all callers with the same key
+    """
+    with open(path) as f:
+        config_data = json.load(f)
+    return cls(**config_data)
+
+
+def _settings_key() -> tuple:
+    """Get what settings depend on besides the config file (env vars, .env file)."""
+    env = tuple(
+        sorted(
+            (key.upper(), value)
+            for key, value in os.environ.items()
+            if key.upper().startswith(ENV_PREFIX)
+        )
+    )
+    try:
+        stat = os.stat(ENV_FILE)
+        dotenv = (os.path.abspath(ENV_FILE), stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        dotenv = None
+    return env, dotenv
+
+
+def _read_env(variables: dict[str, str]) -> dict[str, Any]:
+    """
+    Get the GatewayConfig fields set by environment variables.
+
+    Args:
+        variables: Environment variables (names are case-insensitive)
+
+    Returns:
+        Decoded field values by field name
+
+    Raises:
+        ValueError: If a value is not valid JSON
+    """
+    settings = {}
+    for key, value in variables.items():
+        field = key.upper().removeprefix(ENV_PREFIX).lower()
+        if len(field) == len(key) or field not in GatewayConfig.model_fields:
+            continue
+        try:
+            settings[field] = json.loads(value)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON in {key}: {e}") from e
+    return settings
+
+
+def _read_env_file(path: str) -> dict[str, Any]:
+    """
+    Get the GatewayConfig fields set in a .env file.
+
+    Lines have the form [export] NAME=VALUE; values may be quoted, and
+    blank lines and lines starting with # are ignored.
+
+    Args:
+        path: Path to the .env file
+
+    Returns:
+        Decoded field values by field name (empty if the file doesn't exist)
+
+    Raises:
+        ValueError: If a value is not valid JSON
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        return {}
+
+    variables = {}
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        key, value = line.removeprefix("export ").split("=", 1)
+        value = value.strip()
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+            value = value[1:-1]
+        variables[key.strip()] = value
+    return _read_env(variables)
+
+
+def _deep_update(base: dict[str, Any], updates: dict[str, Any]) -> dict[str, Any]:
+    """
+    Merge nested dictionaries, values from updates taking precedence.
+
+    Args:
+        base: Values to start from
+        updates: Values to merge in
+
+    Returns:
+        New merged dictionary
+    """
+    merged = dict(base)
+    for key, value in updates.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _deep_update(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
 # Default security scanning rules
 DEFAULT_SCAN_RULES = [
     ScanRule(
@@ -209,7 +388,10 @@ DEFAULT_SCAN_RULES = [
     ScanRule(
         name="email-address",
         description="Email address",
-        pattern=r"\b[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}\b",
+        # Parts are capped at the SMTP length limits (64 and 255) so text that
+        # merely looks like a long address can't make every match attempt run
+        # to the end of it, which is quadratic in its length
+        pattern=r"\b[a-zA-Z0-9._%+-]{1,64}@[a-zA-Z0-9.-]{1,255}\.[a-zA-Z]{2,}\b",
         action=ActionType.LOG,
         severity=Severity.LOW,
     ),
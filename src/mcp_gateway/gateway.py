@@ -1,15 +1,180 @@
 """Main gateway implementation for stdio MCP servers."""
 
+import errno
+import os
+import selectors
 import subprocess
 import sys
-import threading
 import time
-from typing import IO
+from collections import Counter
 
 from .config import ActionType, GatewayConfig
 from .logger import GatewayLogger, MetricsCollector
 from .parser import MessageParser
-from .scanner import AlertManager, SecurityScanner
+from .scanner import NO_VIOLATIONS, AlertManager, SecurityScanner
+
+# Maximum number of bytes read from a pipe at a time
+READ_CHUNK_SIZE = 65536
+
+# Maximum number of buffers passed to a single writev() call
+WRITEV_MAX_BUFFERS = 1024
+
+# Maximum number of bytes moved by a single splice() call
+SPLICE_CHUNK_SIZE = 1 << 20
+
+# Stop reading from the client while this many bytes are waiting to be
+# written to the server
+MAX_PENDING_BYTES = 4 * 1024 * 1024
+
+# Action name of violations that block their message (enum values are slow
+# to look up)
+_BLOCK_ACTION = ActionType.BLOCK.value
+
+
+class _LineBuffer:
+    """Splits a byte stream into blocks of complete lines."""
+
+    def __init__(self):
+        """Initialize an empty buffer."""
+        self._pending = bytearray()
+
+    def feed(self, chunk: bytes) -> bytes:
+        """
+        Add data read from the stream.
+
+        Every complete line available after a read is returned in one block,
+        so messages that arrive together are parsed together. A trailing
+        partial line is kept until its newline arrives.
+
+        Args:
+            chunk: Data read from the stream
+
+        Returns:
+            One or more newline-terminated lines, or b"" if no line is complete
+        """
+        if not self._pending and chunk.endswith(b"\n"):
+            # Common case: the read ended on a message boundary
+            return chunk
+
+        # Only the new data can hold a newline, so a long line arriving in
+        # many reads isn't searched again on each one
+        start = len(self._pending)
+        self._pending += chunk
+        end = self._pending.rfind(b"\n", start) + 1
+        if not end:
+            return b""
+        block = bytes(self._pending[:end])
+        del self._pending[:end]
+        return block
+
+    def flush(self) -> bytes:
+        """
+        Get what is left at the end of the stream.
+
+        Returns:
+            The final line if the stream ended without a newline, else b""
+        """
+        block = bytes(self._pending)
+        self._pending.clear()
+        return block
+
+
+def _write_some(fd: int, chunks: list[bytes]) -> int:
+    """
+    Write a batch of chunks with a single system call.
+
+    Uses writev() where available, falling back to one write() of the
+    joined chunks.
+
+    Args:
+        fd: File descriptor to write to
+        chunks: Byte strings to write, in order (at least one)
+
+    Returns:
+        Number of bytes written
+    """
+    if hasattr(os, "writev") and 1 < len(chunks) <= WRITEV_MAX_BUFFERS:
+        return os.writev(fd, chunks)
+    return os.write(fd, chunks[0] if len(chunks) == 1 else b"".join(chunks))
+
+
+def _write_all(fd: int, chunks: list[bytes]):
+    """
+    Write a batch of chunks to a blocking file descriptor.
+
+    Partial writes are retried until everything is written.
+
+    Args:
+        fd: File descriptor to write to
+        chunks: Byte strings to write, in order
+    """
+    if not chunks:
+        return
+
+    written = _write_some(fd, chunks)
+    if written == sum(map(len, chunks)):
+        return
+
+    view = memoryview(b"".join(chunks))[written:]
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+class _PipeWriter:
+    """Writes to a non-blocking pipe, keeping what the pipe can't take yet."""
+
+    def __init__(self, fd: int):
+        """
+        Initialize the writer.
+
+        Args:
+            fd: Write end of a pipe, switched to non-blocking mode
+        """
+        self.fd = fd
+        self.pending = bytearray()
+        os.set_blocking(fd, False)
+
+    def write(self, chunks: list[bytes]):
+        """
+        Write chunks, queueing whatever doesn't fit in the pipe.
+
+        Args:
+            chunks: Byte strings to write, in order
+
+        Raises:
+            BrokenPipeError: If the reading end has been closed
+        """
+        if not chunks:
+            return
+
+        written = 0
+        if not self.pending:
+            try:
+                written = _write_some(self.fd, chunks)
+            except BlockingIOError:
+                pass
+            if written == sum(map(len, chunks)):
+                return
+
+        self.pending += memoryview(b"".join(chunks))[written:]
+
+    def flush(self) -> bool:
+        """
+        Write as much of the queued data as the pipe takes.
+
+        Returns:
+            True if nothing is left queued
+
+        Raises:
+            BrokenPipeError: If the reading end has been closed
+        """
+        try:
+            written = os.write(self.fd, self.pending)
+        except BlockingIOError:
+            return False
+        del self.pending[:written]
+        return not self.pending
 
 
 class StdioGateway:
@@ -39,13 +204,27 @@ class StdioGateway:
         self.alert_manager = AlertManager(config)
         self.metrics = MetricsCollector(config)
 
-        # Message parsers for each direction
-        self.client_parser = MessageParser()
-        self.server_parser = MessageParser()
+        # Which directions are scanned, decided once rather than per message
+        self._scan_requests = self.scanner.scans_direction("client->server")
+        self._scan_responses = self.scanner.scans_direction("server->client")
+
+        # Message parsers for each direction. Unscanned messages are forwarded
+        # as they were read, so their text isn't kept.
+        self.client_parser = MessageParser(keep_raw=self._scan_requests)
+        self.server_parser = MessageParser(keep_raw=self._scan_responses)
 
         # Server process
         self.server_process: subprocess.Popen | None = None
 
+        # Event loop state, set up in _run()
+        self._selector: selectors.BaseSelector | None = None
+        self._server_stdin: _PipeWriter | None = None
+        self._client_lines = _LineBuffer()
+        self._server_lines = _LineBuffer()
+        self._stderr_lines = _LineBuffer()
+        self._client_eof = False
+        self._server_stdout_open = True
+
     def start(self):
         """Start the gateway and spawn the actual MCP server."""
         self.logger.info(
@@ -62,174 +241,329 @@ class StdioGateway:
                 stderr=subprocess.PIPE,
                 bufsize=0,  # Unbuffered
             )
+            self._stdout_fd = sys.stdout.fileno()
 
-            # Create threads for bidirectional forwarding
-            client_to_server = threading.Thread(
-                target=self._forward_client_to_server,
-                daemon=True,
-            )
-            server_to_client = threading.Thread(
-                target=self._forward_server_to_client,
-                daemon=True,
-            )
-            stderr_handler = threading.Thread(
-                target=self._handle_server_stderr,
-                daemon=True,
-            )
-
-            # Start all threads
-            client_to_server.start()
-            server_to_client.start()
-            stderr_handler.start()
+            # Forward in both directions until the server closes its stdout
+            self._run()
 
             # Wait for the server process to exit
             self.server_process.wait()
 
-            # Wait for threads to finish
-            client_to_server.join(timeout=1)
-            server_to_client.join(timeout=1)
-
         except Exception as e:
             self.logger.error(f"Error in gateway: {e}")
             raise
         finally:
             self._cleanup()
 
-    def _forward_client_to_server(self):
-        """Forward messages from client (stdin) to server with inspection."""
-        try:
-            while True:
-                # Read from stdin
-                line = sys.stdin.readline()
-                if not line:
-                    break
+    def _run(self):
+        """
+        Forward messages between the client and the server.
 
-                start_time = time.time()
+        A single thread waits for any of our stdin, the server's stdout and
+        the server's stderr to become readable and handles whatever arrived.
+        Writes to the server are non-blocking, so a server that is busy
+        writing a large response can never deadlock against us.
+        """
+        # Only a handful of descriptors are watched, so poll() is as fast as
+        # epoll(), and unlike epoll() it also accepts a regular file as stdin
+        if hasattr(selectors, "PollSelector"):
+            self._selector = selectors.PollSelector()
+        else:
+            self._selector = selectors.DefaultSelector()
+        self._stdin_fd = sys.stdin.fileno()
+        self._server_stdin = _PipeWriter(self.server_process.stdin.fileno())
+        self._server_stdout_fd = self.server_process.stdout.fileno()
+        self._server_stderr_fd = self.server_process.stderr.fileno()
+
+        # Directions nothing needs to look at are spliced straight through.
+        # Block responses are written to our stdout from the client side,
+        # so the server side is only spliced if the client side is as well.
+        self._client_reader = self._on_client_readable
+        self._server_reader = self._on_server_readable
+        if hasattr(os, "splice") and not self._inspects("client->server"):
+            self._client_reader = self._splice_client_to_server
+            if not self._inspects("server->client"):
+                self._server_reader = self._splice_server_to_client
+
+        self._selector.register(self._stdin_fd, selectors.EVENT_READ, self._client_reader)
+        self._selector.register(self._server_stdout_fd, selectors.EVENT_READ, self._server_reader)
+        self._selector.register(
+            self._server_stderr_fd, selectors.EVENT_READ, self._on_stderr_readable
+        )
 
-                # Parse messages
-                messages = self.client_parser.feed(line)
+        # Where supported, also watch for the server process exiting, in case
+        # a process it started keeps its stdout open (Linux 5.3+)
+        self._pidfd = None
+        if hasattr(os, "pidfd_open"):
+            try:
+                self._pidfd = os.pidfd_open(self.server_process.pid)
+            except OSError:
+                pass
+            else:
+                self._selector.register(self._pidfd, selectors.EVENT_READ, self._on_server_exited)
 
-                for message in messages:
-                    # Record metrics
-                    self.metrics.record_message(message, "client->server")
+        try:
+            while self._server_stdout_open:
+                # Wake up to write a waiting audit frame even when idle
+                for key, _ in self._selector.select(self.logger.flush_due_in()):
+                    # An earlier callback may have stopped watching this one
+                    if self._is_registered(key.fd):
+                        key.data()
+                # Log and audit lines are written once per round
+                self.logger.flush()
+
+            # Pick up stderr output the server wrote right before exiting
+            while any(
+                key.fd == self._server_stderr_fd for key, _ in self._selector.select(timeout=0)
+            ):
+                self._on_stderr_readable()
+        finally:
+            self._selector.close()
+            if self._pidfd is not None:
+                os.close(self._pidfd)
 
-                    # Scan the message
-                    scan_result = self.scanner.scan_message(message, "client->server")
+    def _inspects(self, direction: str) -> bool:
+        """
+        Check whether messages in one direction need to be parsed.
 
-                    # Log violations
-                    for violation in scan_result.violations:
-                        self.logger.log_violation(
-                            rule_name=violation["rule_name"],
-                            severity=violation["severity"],
-                            action=violation["action"],
-                            match=violation["match"],
-                            message=message,
-                            direction="client->server",
-                        )
-                        self.metrics.record_violation(
-                            violation["rule_name"],
-                            violation["action"] == ActionType.BLOCK.value,
-                        )
+        Args:
+            direction: Message direction (client->server or server->client)
 
-                    # Send alerts if needed
-                    if scan_result.has_violations():
-                        self.alert_manager.send_alert(
-                            message=message,
-                            scan_result=scan_result,
-                            direction="client->server",
-                            server_name=self.server_name,
-                        )
+        Returns:
+            True if messages are scanned, audited or counted
+        """
+        scanned = self._scan_requests if direction == "client->server" else self._scan_responses
+        metrics = self.config.metrics
+        counted = metrics.enabled and (metrics.collect_message_counts or metrics.collect_latency)
+        return scanned or self.config.auditing.enabled or counted
+
+    def _is_registered(self, fd: int) -> bool:
+        """Check whether the event loop is watching a file descriptor."""
+        return fd in self._selector.get_map()
+
+    def _on_client_readable(self):
+        """Read from our stdin and forward complete messages to the server."""
+        chunk = os.read(self._stdin_fd, READ_CHUNK_SIZE)
+        if chunk:
+            block = self._client_lines.feed(chunk)
+            if block:
+                self._forward(block, "client->server")
+            return
+
+        # The client closed our stdin: forward a final unterminated message,
+        # then close the server's stdin so it shuts down as well
+        self._selector.unregister(self._stdin_fd)
+        self._client_eof = True
+        block = self._client_lines.flush()
+        if block or self.client_parser.buffer:
+            self._forward(block, "client->server", final=True)
+        self._update_server_stdin()
+
+    def _splice_client_to_server(self):
+        """Move data from our stdin to the server's stdin without inspecting it."""
+        try:
+            moved = os.splice(self._stdin_fd, self._server_stdin.fd, SPLICE_CHUNK_SIZE)
+        except BlockingIOError:
+            # The server's stdin is full, continue once it can take more
+            self._selector.unregister(self._stdin_fd)
+            self._selector.register(
+                self._server_stdin.fd, selectors.EVENT_WRITE, self._on_server_writable
+            )
+            return
+        except BrokenPipeError:
+            self._server_stdin_broken()
+            self._update_server_stdin()
+            return
+        except OSError as e:
+            if e.errno != errno.EINVAL:
+                raise
+            # Neither end supports splicing (e.g. a terminal), copy instead
+            self._client_reader = self._on_client_readable
+            self._selector.modify(self._stdin_fd, selectors.EVENT_READ, self._client_reader)
+            return
+
+        if not moved:
+            self._selector.unregister(self._stdin_fd)
+            self._client_eof = True
+            self._update_server_stdin()
+
+    def _on_server_writable(self):
+        """Write queued messages to the server's stdin."""
+        try:
+            self._server_stdin.flush()
+        except BrokenPipeError:
+            self._server_stdin_broken()
+        self._update_server_stdin()
+
+    def _update_server_stdin(self):
+        """Watch or close the server's stdin depending on what is queued."""
+        writer = self._server_stdin
+        if writer.fd < 0:
+            return
+        watching = self._is_registered(writer.fd)
+
+        if writer.pending:
+            if not watching:
+                self._selector.register(writer.fd, selectors.EVENT_WRITE, self._on_server_writable)
+            # Apply backpressure to the client if the server is not keeping up
+            if len(writer.pending) > MAX_PENDING_BYTES and self._is_registered(self._stdin_fd):
+                self._selector.unregister(self._stdin_fd)
+            return
+
+        if watching:
+            self._selector.unregister(writer.fd)
+        if self._client_eof:
+            self.server_process.stdin.close()
+            writer.fd = -1
+        elif not self._is_registered(self._stdin_fd):
+            self._selector.register(self._stdin_fd, selectors.EVENT_READ, self._client_reader)
+
+    def _server_stdin_broken(self):
+        """Handle the server no longer reading its stdin."""
+        self.logger.error("Server closed its stdin, dropping client messages")
+        self._server_stdin.pending.clear()
+        self._client_eof = True
+        if self._is_registered(self._stdin_fd):
+            self._selector.unregister(self._stdin_fd)
+
+    def _on_server_readable(self):
+        """Read from the server's stdout and forward complete messages to the client."""
+        chunk = os.read(self._server_stdout_fd, READ_CHUNK_SIZE)
+        if chunk:
+            block = self._server_lines.feed(chunk)
+            if block:
+                self._forward(block, "server->client")
+            return
+
+        self._close_server_stdout()
+
+    def _close_server_stdout(self):
+        """Stop reading the server's stdout, which ends the event loop."""
+        self._selector.unregister(self._server_stdout_fd)
+        self._server_stdout_open = False
+
+        # Forward a final unterminated message
+        block = self._server_lines.flush()
+        if block or self.server_parser.buffer:
+            self._forward(block, "server->client", final=True)
+
+    def _on_server_exited(self):
+        """Forward what the exited server process left in its stdout, then stop."""
+        self._selector.unregister(self._pidfd)
+        os.set_blocking(self._server_stdout_fd, False)
+        try:
+            while self._server_stdout_open:
+                self._server_reader()
+        except BlockingIOError:
+            # Everything was read, but another process still has the pipe open
+            self._close_server_stdout()
+
+    def _splice_server_to_client(self):
+        """Move data from the server's stdout to our stdout without inspecting it."""
+        try:
+            moved = os.splice(self._server_stdout_fd, self._stdout_fd, SPLICE_CHUNK_SIZE)
+        except OSError as e:
+            if e.errno != errno.EINVAL:
+                raise
+            self._server_reader = self._on_server_readable
+            self._selector.modify(self._server_stdout_fd, selectors.EVENT_READ, self._server_reader)
+            return
+
+        if not moved:
+            self._close_server_stdout()
+
+    def _on_stderr_readable(self):
+        """Read from the server's stderr and log complete lines."""
+        chunk = os.read(self._server_stderr_fd, READ_CHUNK_SIZE)
+        if chunk:
+            block = self._stderr_lines.feed(chunk)
+        else:
+            self._selector.unregister(self._server_stderr_fd)
+            block = self._stderr_lines.flush()
+        if block:
+            self._handle_server_stderr(block)
+
+    def _forward(self, block: bytes, direction: str, final: bool = False):
+        """
+        Forward messages read in one direction with inspection.
 
-                    # Audit log
+        Block responses always go to the client. Client messages go to the
+        server; server messages go to the client with the block responses,
+        in the order they were read.
+
+        Args:
+            block: One or more complete lines read from stdin or the server's stdout
+            direction: Message direction (client->server or server->client)
+            final: Whether the stream has ended, so the block is its last
+                (possibly unterminated) data and the parser is flushed
+        """
+        try:
+            start_time = time.perf_counter_ns()
+            to_server = direction == "client->server"
+            parser = self.client_parser if to_server else self.server_parser
+            scanned = self._scan_requests if to_server else self._scan_responses
+
+            # Parse messages. An invalid byte only spoils its own message
+            # instead of the whole read.
+            messages = parser.feed(block.decode("utf-8", errors="replace"))
+            if final:
+                messages += parser.flush()
+            forwarded: list[bytes] = []
+            responses: list[bytes] = [] if to_server else forwarded
+
+            violation_counts: Counter[str] = Counter()
+            blocked_violations = 0
+
+            if not scanned:
+                # Nothing can change or block these messages, so they are only
+                # audited and the lines go through as they were read
+                for message in messages:
                     self.logger.audit(
-                        direction="client->server",
+                        direction=direction,
                         message=message,
                         server_name=self.server_name,
-                        blocked=scan_result.should_block,
-                        violations=scan_result.violations if scan_result.has_violations() else None,
                     )
-
-                    # Handle blocking
-                    if scan_result.should_block:
-                        # Only send error response for requests (not notifications)
-                        # JSON-RPC 2.0 forbids responses to notifications (messages without id)
-                        if message.message_id is not None:
-                            error_response = self.scanner.create_block_response(
-                                message,
-                                scan_result,
-                            )
-                            sys.stdout.write(error_response + "\n")
-                            sys.stdout.flush()
-                        # For notifications, just drop silently when blocked
-                        continue
-
-                    # Forward to server (possibly redacted)
-                    message_to_send = scan_result.modified_message or message.raw_message
-                    if self.server_process and self.server_process.stdin:
-                        self.server_process.stdin.write(
-                            (message_to_send + "\n").encode("utf-8")
-                        )
-                        self.server_process.stdin.flush()
-
-                # Record latency
-                latency_ms = (time.time() - start_time) * 1000
-                self.metrics.record_latency(latency_ms)
-
-        except Exception as e:
-            self.logger.error(f"Error in client->server forwarding: {e}")
-
-    def _forward_server_to_client(self):
-        """Forward messages from server (stdout) to client with inspection."""
-        try:
-            if not self.server_process or not self.server_process.stdout:
-                return
-
-            while True:
-                # Read from server stdout
-                line = self.server_process.stdout.readline()
-                if not line:
-                    break
-
-                line = line.decode("utf-8")
-                start_time = time.time()
-
-                # Parse messages
-                messages = self.server_parser.feed(line)
-
+                if block:
+                    forwarded.append(block)
+            else:
+                # One prefilter pass over all messages of the read usually
+                # shows that none of them needs its own scan
+                clean = len(messages) > 1 and not self.scanner.may_match(
+                    "\n".join(message.raw_message for message in messages), direction
+                )
                 for message in messages:
-                    # Record metrics
-                    self.metrics.record_message(message, "server->client")
-
                     # Scan the message
-                    scan_result = self.scanner.scan_message(message, "server->client")
+                    if clean:
+                        scan_result = NO_VIOLATIONS
+                    else:
+                        scan_result = self.scanner.scan_message(message, direction)
 
                     # Log violations
                     for violation in scan_result.violations:
                         self.logger.log_violation(
-                            rule_name=violation["rule_name"],
-                            severity=violation["severity"],
-                            action=violation["action"],
-                            match=violation["match"],
+                            rule_name=violation.rule_name,
+                            severity=violation.severity,
+                            action=violation.action,
+                            match=violation.match,
                             message=message,
-                            direction="server->client",
-                        )
-                        self.metrics.record_violation(
-                            violation["rule_name"],
-                            violation["action"] == ActionType.BLOCK.value,
+                            direction=direction,
                         )
+                        violation_counts[violation.rule_name] += 1
+                        if violation.action == _BLOCK_ACTION:
+                            blocked_violations += 1
 
                     # Send alerts if needed
                     if scan_result.has_violations():
                         self.alert_manager.send_alert(
                             message=message,
                             scan_result=scan_result,
-                            direction="server->client",
+                            direction=direction,
                             server_name=self.server_name,
                         )
 
                     # Audit log
                     self.logger.audit(
-                        direction="server->client",
+                        direction=direction,
                         message=message,
                         server_name=self.server_name,
                         blocked=scan_result.should_block,
@@ -245,37 +579,48 @@ class StdioGateway:
                                 message,
                                 scan_result,
                             )
-                            sys.stdout.write(error_response + "\n")
-                            sys.stdout.flush()
+                            responses.append((error_response + "\n").encode("utf-8"))
                         # For notifications, just drop silently when blocked
                         continue
 
-                    # Forward to client (possibly redacted)
+                    # Forward (possibly redacted)
                     message_to_send = scan_result.modified_message or message.raw_message
-                    sys.stdout.write(message_to_send + "\n")
-                    sys.stdout.flush()
-
-                # Record latency
-                latency_ms = (time.time() - start_time) * 1000
-                self.metrics.record_latency(latency_ms)
+                    forwarded.append((message_to_send + "\n").encode("utf-8"))
+
+            # Write everything parsed from this read in one go
+            if to_server:
+                _write_all(self._stdout_fd, responses)
+                if self._server_stdin.fd >= 0:
+                    try:
+                        self._server_stdin.write(forwarded)
+                    except BrokenPipeError:
+                        self._server_stdin_broken()
+                    self._update_server_stdin()
+            else:
+                _write_all(self._stdout_fd, forwarded)
+
+            # Record metrics for everything parsed from this read at once
+            latency_ms = (time.perf_counter_ns() - start_time) / 1_000_000
+            self.metrics.record_batch(
+                direction, messages, violation_counts, blocked_violations, latency_ms
+            )
 
         except Exception as e:
-            self.logger.error(f"Error in server->client forwarding: {e}")
+            self.logger.error(f"Error in {direction} forwarding: {e}")
 
-    def _handle_server_stderr(self):
-        """Handle stderr from the server process."""
-        try:
-            if not self.server_process or not self.server_process.stderr:
-                return
-
-            while True:
-                line = self.server_process.stderr.readline()
-                if not line:
-                    break
+    def _handle_server_stderr(self, block: bytes):
+        """
+        Handle stderr from the server process.
 
-                line = line.decode("utf-8").strip()
+        Args:
+            block: One or more complete lines read from the server's stderr
+        """
+        try:
+            for line in block.decode("utf-8", errors="replace").splitlines():
+                line = line.strip()
                 if line:
-                    self.logger.debug(f"Server stderr: {line}")
+                    if self.logger.debug_enabled:
+                        self.logger.debug(f"Server stderr: {line}")
                     # Also forward to our stderr
                     print(f"[{self.server_name}] {line}", file=sys.stderr)
 
@@ -294,6 +639,9 @@ class StdioGateway:
             summary = self.metrics.get_summary()
             self.logger.info(f"Metrics summary:\n{summary}")
 
+        self.alert_manager.close()
+        self.logger.close()
+
         # Terminate server process if still running
         if self.server_process and self.server_process.poll() is None:
             self.server_process.terminate()
@@ -0,0 +1,52 @@
+"""JSON encoding helpers that use orjson when it is installed."""
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # Optional dependency, see the "fast" extra
+    orjson = None
+
+
+def loads(data: str | bytes) -> Any:
+    """
+    Decode a JSON document.
+
+    Args:
+        data: JSON text or UTF-8 encoded bytes
+
+    Returns:
+        Decoded object
+
+    Raises:
+        json.JSONDecodeError: If the data is not valid JSON
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # orjson is stricter than json (NaN, lone surrogates), so let
+            # json make the final call
+            pass
+    return json.loads(data)
+
+
+def dumps(obj: Any, indent: bool = False) -> bytes:
+    """
+    Encode an object as UTF-8 JSON.
+
+    Args:
+        obj: Object to encode
+        indent: Pretty print with two-space indentation
+
+    Returns:
+        Encoded JSON
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+        except TypeError:
+            # Values orjson can't encode, e.g. integers wider than 64 bits
+            pass
+    return json.dumps(obj, indent=2 if indent else None).encode("utf-8")
@@ -1,17 +1,163 @@
 """Logging and auditing functionality for MCP Gateway."""
 
+import atexit
+import functools
 import json
+import os
 import sys
+import time
+import weakref
+from collections import Counter
+from collections.abc import Mapping
 from datetime import datetime
 from pathlib import Path
-from typing import Any
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any
 
+from . import jsonutil
 from .config import GatewayConfig, LogLevel
-from .parser import ParsedMessage
+from .parser import MessageType, ParsedMessage
+
+if TYPE_CHECKING:
+    # auditlog is only imported when compression is enabled, and the
+    # scanner imports the logger
+    from .auditlog import ZstdAuditWriter
+    from .scanner import ScanViolation
+
+# Buffered log and audit lines are written out once they reach this size
+# (and at the end of every event loop round, see GatewayLogger.flush)
+WRITE_BUFFER_SIZE = 65536
+
+# Log levels by increasing severity
+_LEVEL_ORDER = {LogLevel.DEBUG: 0, LogLevel.INFO: 1, LogLevel.WARNING: 2, LogLevel.ERROR: 3}
+
+# Messages from this level up are also printed to stderr
+_STDERR_LEVEL = _LEVEL_ORDER[LogLevel.INFO]
+
+# Level names as written to the log (enum values are slow to look up)
+_LEVEL_NAMES = {level: level.value for level in LogLevel}
+_TEXT_LEVEL_NAMES = {level: level.value.upper() for level in LogLevel}
+
+# Millisecond of the last current_timestamp() call and the timestamp it returned
+_timestamp_cache: tuple[int, str] = (-1, "")
+
+
+def current_timestamp() -> str:
+    """
+    Get the current local time as an ISO 8601 timestamp.
+
+    Messages often arrive in bursts, so the formatted time is reused for
+    all calls within the same millisecond.
+
+    Returns:
+        Timestamp such as "2025-01-31T12:34:56.789012"
+    """
+    global _timestamp_cache
+    now = time.time()
+    millisecond = int(now * 1000)
+    if millisecond != _timestamp_cache[0]:
+        _timestamp_cache = (millisecond, datetime.fromtimestamp(now).isoformat())
+    return _timestamp_cache[1]
+
+
+# Appenders that may still hold buffered lines, written out at exit. The
+# references are weak, so loggers that are no longer used aren't kept alive.
+_open_appenders: "weakref.WeakSet[_LineAppender]" = weakref.WeakSet()
+
+
+def _flush_open_appenders():
+    """Write out the lines buffered by all open appenders."""
+    for appender in list(_open_appenders):
+        try:
+            appender.flush()
+        except Exception as e:
+            print(f"Error writing to {appender.path}: {e}", file=sys.stderr)
+
+
+atexit.register(_flush_open_appenders)
+
+
+class _LineAppender:
+    """Collects lines for a file and appends them with as few writes as possible."""
+
+    def __init__(self, path: Path):
+        """
+        Initialize the appender.
+
+        Args:
+            path: File to append to
+        """
+        self.path = path
+        self._fd: int | None = None
+        self._lines: list[bytes] = []
+        self._size = 0
+        _open_appenders.add(self)
+
+    def write(self, line: str | bytes) -> bool:
+        """
+        Add a line (without its trailing newline).
+
+        Args:
+            line: Line to append, as text or UTF-8 encoded bytes
+
+        Returns:
+            True if the buffer is full and should be flushed
+        """
+        if isinstance(line, str):
+            line = line.encode("utf-8")
+        data = line + b"\n"
+        self._lines.append(data)
+        self._size += len(data)
+        return self._size >= WRITE_BUFFER_SIZE
+
+    def flush(self):
+        """
+        Append the buffered lines.
+
+        Raises:
+            OSError: If the file can't be opened or written
+        """
+        if not self._lines:
+            return
+
+        data = b"".join(self._lines)
+        self._lines.clear()
+        self._size = 0
+
+        # Several gateways may share a file, so all lines go out with one
+        # O_APPEND write rather than through a buffer that may split them
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._fd, view) :]
+
+    def close(self):
+        """Append the buffered lines and close the file."""
+        _open_appenders.discard(self)
+        try:
+            self.flush()
+        finally:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def __del__(self):
+        # Like a file object, an appender that is dropped without being
+        # closed still writes out its lines
+        try:
+            self.close()
+        except Exception:
+            pass
 
 
 class GatewayLogger:
-    """Logger for MCP Gateway."""
+    """
+    Logger for MCP Gateway.
+
+    The log level is read from the configuration when the logger is created,
+    so it isn't looked up for every message. Use set_level() to change it.
+    """
 
     def __init__(self, config: GatewayConfig):
         """
@@ -21,9 +167,30 @@ class GatewayLogger:
             config: Gateway configuration
         """
         self.config = config
+        self.set_level(config.logging.level)
+        self._format_log_line = (
+            _format_json_log_line if config.logging.format == "json" else _format_text_log_line
+        )
+        self._log_appender: _LineAppender | None = None
+        self._audit_appender: _LineAppender | None = None
+        self._audit_writer: "ZstdAuditWriter | None" = None
         self._setup_logging()
         self._setup_auditing()
 
+    def set_level(self, level: LogLevel):
+        """
+        Change the log level of the logger (and its configuration).
+
+        Args:
+            level: Lowest level of the messages to log
+        """
+        self.config.logging.level = level
+        self._min_level = _LEVEL_ORDER[level]
+        enabled = self.config.logging.enabled
+        # Lets callers skip building debug messages that would be dropped
+        self.debug_enabled = enabled and self._min_level == 0
+        self._warnings_enabled = enabled and self._min_level <= _LEVEL_ORDER[LogLevel.WARNING]
+
     def _setup_logging(self):
         """Set up logging destination."""
         if not self.config.logging.enabled:
@@ -35,6 +202,7 @@ class GatewayLogger:
         # Create log file with timestamp
         timestamp = datetime.now().strftime("%Y%m%d")
         self.log_file = log_dir / f"gateway-{timestamp}.log"
+        self._log_appender = _LineAppender(self.log_file)
 
     def _setup_auditing(self):
         """Set up audit logging."""
@@ -44,6 +212,24 @@ class GatewayLogger:
         audit_log = self.config.auditing.audit_log
         audit_log.parent.mkdir(parents=True, exist_ok=True)
         self.audit_file = audit_log
+        self._audit_appender = _LineAppender(audit_log)
+
+        if self.config.auditing.compression == "zstd":
+            from . import auditlog
+
+            if auditlog.zstandard is None:
+                print(
+                    "zstandard is not installed, writing an uncompressed audit log",
+                    file=sys.stderr,
+                )
+            else:
+                self._audit_writer = auditlog.ZstdAuditWriter(auditlog.compressed_path(audit_log))
+
+        # Entries without content are formatted directly unless they go to
+        # the compressed log (see _format_audit_entry)
+        self._plain_audit = (
+            not self.config.auditing.include_message_content and self._audit_writer is None
+        )
 
     def log(self, level: LogLevel, message: str, **kwargs):
         """
@@ -58,39 +244,24 @@ class GatewayLogger:
             return
 
         # Filter by log level
-        levels = [LogLevel.DEBUG, LogLevel.INFO, LogLevel.WARNING, LogLevel.ERROR]
-        if levels.index(level) < levels.index(self.config.logging.level):
+        rank = _LEVEL_ORDER[level]
+        if rank < self._min_level:
             return
 
-        timestamp = datetime.now().isoformat()
-
-        if self.config.logging.format == "json":
-            log_entry = {
-                "timestamp": timestamp,
-                "level": level.value,
-                "message": message,
-                **kwargs,
-            }
-            log_line = json.dumps(log_entry)
-        else:
-            # Text format
-            extra = " ".join(f"{k}={v}" for k, v in kwargs.items())
-            log_line = f"[{timestamp}] {level.value.upper()}: {message} {extra}"
+        log_line = self._format_log_line(current_timestamp(), level, message, kwargs)
 
         # Write to log file
-        try:
-            with open(self.log_file, "a") as f:
-                f.write(log_line + "\n")
-        except Exception as e:
-            print(f"Error writing to log file: {e}", file=sys.stderr)
+        if self._log_appender.write(log_line):
+            self._flush_log()
 
         # Also print to stderr for INFO and above
-        if level in [LogLevel.INFO, LogLevel.WARNING, LogLevel.ERROR]:
+        if rank >= _STDERR_LEVEL:
             print(log_line, file=sys.stderr)
 
     def debug(self, message: str, **kwargs):
         """Log a debug message."""
-        self.log(LogLevel.DEBUG, message, **kwargs)
+        if self.debug_enabled:
+            self.log(LogLevel.DEBUG, message, **kwargs)
 
     def info(self, message: str, **kwargs):
         """Log an info message."""
@@ -110,7 +281,7 @@ class GatewayLogger:
         message: ParsedMessage,
         server_name: str | None = None,
         blocked: bool = False,
-        violations: list[dict[str, Any]] | None = None,
+        violations: list["ScanViolation"] | None = None,
     ):
         """
         Log an audit entry.
@@ -125,7 +296,15 @@ class GatewayLogger:
         if not self.config.auditing.enabled:
             return
 
-        timestamp = datetime.now().isoformat()
+        timestamp = current_timestamp()
+
+        if self._plain_audit and not violations:
+            # Without content or violations, entries only have short fields
+            # that are formatted directly instead of building a dict
+            self._write_audit_line(
+                _format_audit_entry(timestamp, direction, server_name, message, blocked)
+            )
+            return
 
         audit_entry = {
             "timestamp": timestamp,
@@ -152,19 +331,97 @@ class GatewayLogger:
         if self.config.auditing.include_message_content:
             audit_entry["params"] = message.params
             audit_entry["result"] = message.result
-            audit_entry["error"] = message.error.model_dump() if message.error else None
+            error = message.error
+            # JsonRpcError has three plain fields; model_dump() would walk the
+            # model to produce the same dict
+            audit_entry["error"] = (
+                {"code": error.code, "message": error.message, "data": error.data}
+                if error
+                else None
+            )
 
         # Add violations
         if violations:
-            audit_entry["violations"] = violations
+            audit_entry["violations"] = [violation.to_dict() for violation in violations]
 
         # Write to audit log (JSONL format)
+        if self._audit_writer is not None:
+            try:
+                self._audit_writer.write(audit_entry)
+            except Exception as e:
+                self.error(f"Error writing to audit log: {e}")
+        else:
+            self._write_audit_line(jsonutil.dumps(audit_entry))
+
+    def _write_audit_line(self, audit_line: str | bytes):
+        """
+        Append an entry to the (uncompressed) audit log.
+
+        Args:
+            audit_line: JSON-encoded audit entry, as text or UTF-8 encoded bytes
+        """
+        if self._audit_appender.write(audit_line):
+            self._flush_audit()
+
+    def _flush_log(self):
+        """Write out buffered log lines."""
         try:
-            with open(self.audit_file, "a") as f:
-                f.write(json.dumps(audit_entry) + "\n")
+            self._log_appender.flush()
+        except Exception as e:
+            print(f"Error writing to log file: {e}", file=sys.stderr)
+
+    def _flush_audit(self):
+        """Write out buffered (uncompressed) audit entries."""
+        try:
+            self._audit_appender.flush()
         except Exception as e:
             self.error(f"Error writing to audit log: {e}")
 
+    def flush(self):
+        """
+        Write out buffered log lines and audit entries.
+
+        Compressed audit entries are only written once their frame is due
+        (see flush_due_in), so frames don't end up holding a few entries each.
+        """
+        # Audit errors are logged, so the log goes last
+        if self._audit_appender is not None:
+            self._flush_audit()
+        if self._audit_writer is not None:
+            try:
+                self._audit_writer.flush_if_due()
+            except Exception as e:
+                self.error(f"Error writing to audit log: {e}")
+        if self._log_appender is not None:
+            self._flush_log()
+
+    def flush_due_in(self) -> float | None:
+        """
+        Get the time until flush() has entries to write that are waiting now.
+
+        Returns:
+            Seconds until the compressed audit frame is due, or None if
+            nothing is waiting for a deadline
+        """
+        if self._audit_writer is None:
+            return None
+        return self._audit_writer.flush_due_in()
+
+    def close(self):
+        """Write out any buffered log lines and audit entries."""
+        if self._audit_writer is not None:
+            try:
+                self._audit_writer.close()
+            except Exception as e:
+                self.error(f"Error writing to audit log: {e}")
+
+        for appender in (self._audit_appender, self._log_appender):
+            if appender is not None:
+                try:
+                    appender.close()
+                except Exception as e:
+                    print(f"Error writing to {appender.path}: {e}", file=sys.stderr)
+
     def log_violation(
         self,
         rule_name: str,
@@ -185,17 +442,111 @@ class GatewayLogger:
             message: The message containing the violation
             direction: Message direction
         """
-        self.warning(
+        if not self._warnings_enabled:
+            return
+
+        if len(match) > 50:
+            match = f"{match[:50]}..."
+        self.log(
+            LogLevel.WARNING,
             "Security violation detected",
             rule=rule_name,
             severity=severity,
             action=action,
-            match=match[:50] + "..." if len(match) > 50 else match,
+            match=match,
             direction=direction,
             method=message.method,
         )
 
 
+def _format_json_log_line(
+    timestamp: str, level: LogLevel, message: str, fields: dict[str, Any]
+) -> str:
+    """Format a log line in the json format."""
+    log_entry = {
+        "timestamp": timestamp,
+        "level": _LEVEL_NAMES[level],
+        "message": message,
+        **fields,
+    }
+    return jsonutil.dumps(log_entry).decode("utf-8")
+
+
+def _format_text_log_line(
+    timestamp: str, level: LogLevel, message: str, fields: dict[str, Any]
+) -> str:
+    """Format a log line in the text format."""
+    extra = " ".join([f"{k}={v}" for k, v in fields.items()])
+    return f"[{timestamp}] {_TEXT_LEVEL_NAMES[level]}: {message} {extra}"
+
+
+@functools.lru_cache(maxsize=1024)
+def _json_string(value: str) -> str:
+    """Encode a string as JSON, caching the (mostly repeated) results."""
+    return json.dumps(value)
+
+
+def _json_value(value: Any) -> str:
+    """Encode a value as JSON, the same way json.dumps() does."""
+    if isinstance(value, str):
+        return _json_string(value)
+    if type(value) is int:
+        return str(value)
+    return json.dumps(value)
+
+
+@functools.lru_cache(maxsize=256)
+def _audit_entry_fields(direction: str, server_name: str | None, message_type: MessageType) -> str:
+    """Format the audit entry fields that repeat for every message of a kind."""
+    return (
+        f'", "direction": {json.dumps(direction)}, "server": {json.dumps(server_name)}, '
+        f'"message_type": {json.dumps(message_type.value)}, "message_id": '
+    )
+
+
+def _format_audit_entry(
+    timestamp: str,
+    direction: str,
+    server_name: str | None,
+    message: ParsedMessage,
+    blocked: bool,
+) -> str:
+    """
+    Format an audit entry without message content or violations.
+
+    The result is identical to json.dumps() of the entry built by
+    GatewayLogger.audit().
+
+    Returns:
+        JSON-encoded audit entry
+    """
+    parts = [
+        # ISO timestamps need no escaping (and would only flush the cache)
+        '{"timestamp": "',
+        timestamp,
+        _audit_entry_fields(direction, server_name, message.message_type),
+        _json_value(message.message_id),
+        ', "blocked": true' if blocked else ', "blocked": false',
+    ]
+
+    # Add method for requests. The method is compared first because the
+    # checks below look up enum members, which is comparatively slow.
+    method = message.method
+    if method:
+        parts += (', "method": ', _json_string(method))
+
+        # Add tool name for tool calls
+        if method == "tools/call" and message.is_tool_call():
+            parts += (', "tool": ', _json_value(message.get_tool_name()))
+
+        # Add resource URI for resource reads
+        if method == "resources/read" and message.is_resource_read():
+            parts += (', "resource_uri": ', _json_value(message.get_resource_uri()))
+
+    parts.append("}")
+    return "".join(parts)
+
+
 class MetricsCollector:
     """Collects metrics for monitoring."""
 
@@ -210,9 +561,9 @@ class MetricsCollector:
         self.metrics = {
             "messages_processed": 0,
             "messages_by_direction": {"client->server": 0, "server->client": 0},
-            "messages_by_type": {},
-            "tool_calls": {},
-            "violations": {},
+            "messages_by_type": Counter(),
+            "tool_calls": Counter(),
+            "violations": Counter(),
             "blocked_messages": 0,
             "total_latency_ms": 0,
         }
@@ -225,27 +576,20 @@ class MetricsCollector:
         self.metrics["messages_processed"] += 1
         self.metrics["messages_by_direction"][direction] += 1
 
-        msg_type = message.message_type.value
-        self.metrics["messages_by_type"][msg_type] = (
-            self.metrics["messages_by_type"].get(msg_type, 0) + 1
-        )
+        self.metrics["messages_by_type"][message.message_type.value] += 1
 
         # Track tool calls
         if message.is_tool_call():
             tool_name = message.get_tool_name()
             if tool_name:
-                self.metrics["tool_calls"][tool_name] = (
-                    self.metrics["tool_calls"].get(tool_name, 0) + 1
-                )
+                self.metrics["tool_calls"][tool_name] += 1
 
     def record_violation(self, rule_name: str, blocked: bool):
         """Record a security violation."""
         if not self.config.metrics.collect_violation_counts:
             return
 
-        self.metrics["violations"][rule_name] = (
-            self.metrics["violations"].get(rule_name, 0) + 1
-        )
+        self.metrics["violations"][rule_name] += 1
 
         if blocked:
             self.metrics["blocked_messages"] += 1
@@ -257,9 +601,56 @@ class MetricsCollector:
 
         self.metrics["total_latency_ms"] += latency_ms
 
-    def get_metrics(self) -> dict[str, Any]:
-        """Get current metrics."""
-        return self.metrics.copy()
+    def record_batch(
+        self,
+        direction: str,
+        messages: list[ParsedMessage],
+        violations: Counter[str],
+        blocked: int,
+        latency_ms: float,
+    ):
+        """
+        Record the messages processed together after one read.
+
+        Same as calling record_message() for every message, record_violation()
+        for every violation and record_latency() for the batch.
+
+        Args:
+            direction: Message direction (client->server or server->client)
+            messages: Processed messages
+            violations: Number of violations by rule name
+            blocked: Number of violations whose rule blocks the message
+            latency_ms: Processing latency of the batch
+        """
+        metrics = self.metrics
+        config = self.config.metrics
+
+        if config.collect_message_counts and messages:
+            metrics["messages_processed"] += len(messages)
+            metrics["messages_by_direction"][direction] += len(messages)
+
+            # Enum values are slow to look up, so count by member first
+            by_type = Counter(message.message_type for message in messages)
+            for msg_type, count in by_type.items():
+                metrics["messages_by_type"][msg_type.value] += count
+
+            # Track tool calls
+            metrics["tool_calls"].update(
+                tool_name
+                for message in messages
+                if message.method == "tools/call" and (tool_name := message.get_tool_name())
+            )
+
+        if config.collect_violation_counts and violations:
+            metrics["violations"].update(violations)
+            metrics["blocked_messages"] += blocked
+
+        if config.collect_latency:
+            metrics["total_latency_ms"] += latency_ms
+
+    def get_metrics(self) -> Mapping[str, Any]:
+        """Get a read-only view of the current metrics."""
+        return MappingProxyType(self.metrics)
 
     def get_summary(self) -> str:
         """Get a human-readable metrics summary."""
@@ -277,12 +668,7 @@ class MetricsCollector:
 
         if self.metrics["tool_calls"]:
             summary.append("\nTop tool calls:")
-            sorted_tools = sorted(
-                self.metrics["tool_calls"].items(),
-                key=lambda x: x[1],
-                reverse=True,
-            )
-            for tool, count in sorted_tools[:5]:
+            for tool, count in self.metrics["tool_calls"].most_common(5):
                 summary.append(f"  {tool}: {count}")
 
         if self.metrics["violations"]:
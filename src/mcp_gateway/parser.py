@@ -1,10 +1,24 @@
 """JSON-RPC message parser for MCP protocol."""
 
 import json
+import re
+import sys
+from dataclasses import dataclass, field
 from enum import Enum
 from typing import Any
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel
+
+from . import jsonutil
+
+# Decodes the JSON document at a position, returning it and where it ends
+_decode_document = json.JSONDecoder().raw_decode
+
+# Whitespace allowed between JSON documents
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# Stands in for a line orjson couldn't decode (None is valid JSON)
+_UNDECODED = object()
 
 
 class MessageType(str, Enum):
@@ -49,12 +63,17 @@ class JsonRpcErrorResponse(BaseModel):
     error: JsonRpcError
 
 
-class ParsedMessage(BaseModel):
-    """Parsed JSON-RPC message with metadata."""
+@dataclass(slots=True)
+class ParsedMessage:
+    """
+    Parsed JSON-RPC message with metadata.
+
+    Built by MessageParser, which has already checked the field types, so
+    unlike the payload models this is a plain dataclass without validation.
+    """
 
     message_type: MessageType
-    raw_message: str
-    parsed_data: JsonRpcRequest | JsonRpcResponse | JsonRpcErrorResponse
+    raw_message: str | None = None  # Unless the parser was told not to keep it
 
     # Extracted fields for easy access
     method: str | None = None  # For requests and notifications
@@ -63,6 +82,24 @@ class ParsedMessage(BaseModel):
     error: JsonRpcError | None = None  # For error responses
     message_id: int | str | None = None
 
+    _parsed_data: JsonRpcRequest | JsonRpcResponse | JsonRpcErrorResponse | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    @property
+    def parsed_data(self) -> JsonRpcRequest | JsonRpcResponse | JsonRpcErrorResponse:
+        """Get the typed JSON-RPC payload, built on first access."""
+        if self._parsed_data is None:
+            if self.message_type in (MessageType.REQUEST, MessageType.NOTIFICATION):
+                self._parsed_data = JsonRpcRequest(
+                    id=self.message_id, method=self.method, params=self.params
+                )
+            elif self.message_type == MessageType.ERROR:
+                self._parsed_data = JsonRpcErrorResponse(id=self.message_id, error=self.error)
+            else:
+                self._parsed_data = JsonRpcResponse(id=self.message_id, result=self.result)
+        return self._parsed_data
+
     def is_tool_call(self) -> bool:
         """Check if this is a tool call request."""
         return self.message_type == MessageType.REQUEST and self.method == "tools/call"
@@ -87,85 +124,118 @@ class ParsedMessage(BaseModel):
 class MessageParser:
     """Parser for JSON-RPC messages with buffering support."""
 
-    def __init__(self):
-        """Initialize the parser."""
+    def __init__(self, keep_raw: bool = True):
+        """
+        Initialize the parser.
+
+        Args:
+            keep_raw: Keep the JSON text of parsed messages (raw_message)
+        """
+        self.keep_raw = keep_raw
+        # Start of an incomplete message, and data received after it that
+        # hasn't been looked at yet
         self.buffer = ""
+        self._pending: list[str] = []
 
     def feed(self, data: str) -> list[ParsedMessage]:
         """
         Feed data to the parser and return any complete messages.
 
+        Messages are newline-delimited, so once a message is incomplete,
+        further data is only collected until a line ends. Decoding is then
+        retried once on everything received, rather than on every feed.
+
         Args:
             data: String data to parse
 
         Returns:
             List of parsed messages
         """
-        self.buffer += data
+        if self.buffer and "\n" not in data:
+            self._pending.append(data)
+            return []
+
+        if self._pending:
+            self._pending.append(data)
+            buffer = self.buffer + "".join(self._pending)
+            self._pending.clear()
+        else:
+            buffer = self.buffer + data
         messages = []
 
-        while self.buffer:
-            # Try to find a complete JSON message
-            message, self.buffer = self._extract_message(self.buffer)
-            if message is None:
+        pos = 0
+        size = len(buffer)
+        while True:
+            # Messages normally start right at pos, so the regex only runs
+            # when there is whitespace to skip
+            if pos < size and buffer[pos] in " \t\n\r":
+                pos = _WHITESPACE.match(buffer, pos).end()
+            if pos == size:
                 break
 
+            # A complete line is usually exactly one message, which orjson
+            # decodes faster than the stdlib decoder
+            decoded = _UNDECODED
+            if jsonutil.orjson is not None:
+                newline = buffer.find("\n", pos)
+                if newline != -1:
+                    line = buffer[pos:newline].rstrip(" \t\r")
+                    try:
+                        decoded = jsonutil.orjson.loads(line)
+                    except jsonutil.orjson.JSONDecodeError:
+                        # E.g. several messages on one line, or a message
+                        # spread over several lines
+                        pass
+                    else:
+                        message = line if self.keep_raw else None
+                        # Only whitespace is left before the newline
+                        pos = newline + 1
+
+            if decoded is _UNDECODED:
+                # The C decoder finds where the message ends while decoding it
+                try:
+                    decoded, end = _decode_document(buffer, pos)
+                except json.JSONDecodeError as e:
+                    # Until the line with the error is complete, more data may
+                    # still turn it into valid JSON
+                    newline = buffer.find("\n", e.pos)
+                    if newline == -1:
+                        break
+                    # Otherwise skip the line that isn't valid JSON
+                    pos = newline + 1
+                    continue
+
+                message = buffer[pos:end] if self.keep_raw else None
+                pos = end
             try:
-                parsed = self.parse_message(message)
+                parsed = self._build_message(message, decoded)
                 if parsed:
                     messages.append(parsed)
             except Exception as e:
-                # Log parse error but continue
-                # In production, this would go to logger
-                print(f"Error parsing message: {e}")
+                # Log parse error but continue (stdout may be the
+                # JSON-RPC stream, so it goes to stderr)
+                print(f"Error parsing message: {e}", file=sys.stderr)
                 continue
 
+        self.buffer = buffer[pos:]
         return messages
 
-    def _extract_message(self, buffer: str) -> tuple[str | None, str]:
+    def flush(self) -> list[ParsedMessage]:
         """
-        Extract a single JSON message from the buffer.
+        Parse what is left at the end of the stream.
+
+        The final message may lack its newline, which feed() waits for once
+        the message is incomplete. Anything that still isn't a complete
+        message is dropped.
 
         Returns:
-            Tuple of (message, remaining_buffer)
+            List of parsed messages
         """
-        buffer = buffer.lstrip()
-        if not buffer:
-            return None, ""
-
-        # Try to parse JSON
-        depth = 0
-        in_string = False
-        escape = False
-
-        for i, char in enumerate(buffer):
-            if escape:
-                escape = False
-                continue
-
-            if char == '\\':
-                escape = True
-                continue
-
-            if char == '"' and not escape:
-                in_string = not in_string
-                continue
-
-            if in_string:
-                continue
-
-            if char == '{':
-                depth += 1
-            elif char == '}':
-                depth -= 1
-                if depth == 0:
-                    # Found complete JSON object
-                    message = buffer[:i + 1]
-                    remaining = buffer[i + 1:]
-                    return message, remaining
-
-        # No complete message found
-        return None, buffer
+        messages = self.feed("\n")
+        if self.buffer:
+            print("Error parsing message: incomplete message at end of stream", file=sys.stderr)
+            self.buffer = ""
+        return messages
 
     def parse_message(self, message: str) -> ParsedMessage | None:
         """
@@ -178,13 +248,30 @@ class MessageParser:
             Parsed message or None if invalid
         """
         try:
-            data = json.loads(message)
+            data = jsonutil.loads(message)
         except json.JSONDecodeError:
             return None
+        return self._build_message(message, data)
+
+    def _build_message(self, message: str | None, data: Any) -> ParsedMessage | None:
+        """
+        Build a parsed message from a decoded JSON-RPC message.
 
+        Args:
+            message: JSON string the data was decoded from, if it is kept
+            data: Decoded message
+
+        Returns:
+            Parsed message or None if it is not a JSON-RPC 2.0 message
+        """
         if not isinstance(data, dict) or data.get("jsonrpc") != "2.0":
             return None
 
+        # The typed payload models are only built on demand (see
+        # ParsedMessage.parsed_data); forwarding, scanning and auditing just
+        # need the envelope fields, which are checked here.
+        message_id = _message_id(data.get("id"))
+
         # Determine message type
         if "method" in data:
             # Request or notification
@@ -193,36 +280,43 @@ class MessageParser:
             else:
                 message_type = MessageType.NOTIFICATION
 
-            parsed_data = JsonRpcRequest(**data)
+            method = data["method"]
+            if not isinstance(method, str):
+                raise ValueError(f"Invalid method: {method!r}")
+            params = data.get("params")
+            if params is not None and not isinstance(params, (dict, list)):
+                raise ValueError(f"Invalid params: {params!r}")
+
             return ParsedMessage(
                 message_type=message_type,
                 raw_message=message,
-                parsed_data=parsed_data,
-                method=parsed_data.method,
-                params=parsed_data.params,
-                message_id=parsed_data.id,
+                method=method,
+                params=params,
+                message_id=message_id,
             )
 
         elif "error" in data:
             # Error response
-            parsed_data = JsonRpcErrorResponse(**data)
+            if "id" not in data:
+                raise ValueError("Error response without id")
+
             return ParsedMessage(
                 message_type=MessageType.ERROR,
                 raw_message=message,
-                parsed_data=parsed_data,
-                error=parsed_data.error,
-                message_id=parsed_data.id,
+                error=JsonRpcError.model_validate(data["error"]),
+                message_id=message_id,
             )
 
         elif "result" in data:
             # Success response
-            parsed_data = JsonRpcResponse(**data)
+            if "id" not in data:
+                raise ValueError("Response without id")
+
             return ParsedMessage(
                 message_type=MessageType.RESPONSE,
                 raw_message=message,
-                parsed_data=parsed_data,
-                result=parsed_data.result,
-                message_id=parsed_data.id,
+                result=data["result"],
+                message_id=message_id,
             )
 
         return None
@@ -230,6 +324,27 @@ class MessageParser:
     def reset(self):
         """Reset the parser buffer."""
         self.buffer = ""
+        self._pending.clear()
+
+
+def _message_id(value: Any) -> int | str | None:
+    """
+    Check a message id, converting it the way pydantic would for int | str.
+
+    Args:
+        value: Decoded "id" member
+
+    Returns:
+        The id
+
+    Raises:
+        ValueError: If the value can't be an id
+    """
+    if value is None or type(value) is int or isinstance(value, str):
+        return value
+    if isinstance(value, bool) or (isinstance(value, float) and value.is_integer()):
+        return int(value)
+    raise ValueError(f"Invalid id: {value!r}")
 
 
 def create_error_response(request_id: int | str | None, code: int, message: str, data: Any = None) -> str:
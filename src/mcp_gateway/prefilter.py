@@ -0,0 +1,170 @@
+"""Cheap checks that rule out scan rules before running their regex."""
+
+import re
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python 3.10
+    import sre_parse
+
+try:
+    import ahocorasick
+except ImportError:  # Optional dependency, see the "ahocorasick" extra
+    ahocorasick = None
+
+# ASCII characters \s matches in str patterns. Taken from re itself, as
+# the set is larger than the usual whitespace (it includes \x1c-\x1f).
+_ASCII_WHITESPACE = bytes(c for c in range(128) if re.match(r"\s", chr(c)))
+
+# Maps every ASCII digit to "0" and every ASCII separator the digit rules
+# accept ("-" and whitespace) to "-", so digit structures become literals
+_SHAPE_TABLE = bytes.maketrans(
+    b"0123456789" + _ASCII_WHITESPACE, b"0" * 10 + b"-" * len(_ASCII_WHITESPACE)
+)
+
+# Digit-structured patterns (from DEFAULT_SCAN_RULES) and what their matches
+# look like after translation with _SHAPE_TABLE. A pattern can only match if
+# its shape is found in the translated text.
+DIGIT_SHAPES: dict[str, re.Pattern[bytes]] = {
+    # ssn
+    r"\b\d{3}-\d{2}-\d{4}\b": re.compile(rb"000-00-0000"),
+    # credit-card
+    r"\b(?:\d{4}[-\s]?){3}\d{4}\b": re.compile(rb"0000-?0000-?0000-?0000"),
+}
+
+
+def digit_shape(text: str) -> bytes | None:
+    """
+    Translate text so digit structures can be found with literal searches.
+
+    Args:
+        text: Text to translate
+
+    Returns:
+        Translated text, or None if the text is not ASCII (\\d and \\s also
+        match non-ASCII characters, which the translation doesn't cover)
+    """
+    if not text.isascii():
+        return None
+    return text.encode("ascii").translate(_SHAPE_TABLE)
+
+
+# Character classes with more members than this don't extend a literal (a
+# literal is expanded into one alternative per member)
+_MAX_LITERAL_ALTERNATIVES = 8
+
+
+def required_literals(pattern: str) -> list[str] | None:
+    """
+    Find literals of which at least one occurs in every match of a pattern.
+
+    Only the top level of the pattern is looked at: runs of literal characters,
+    small classes of literal characters (``gh[ps]_`` gives ``ghp_`` and
+    ``ghs_``) and the contents of plain groups. The run whose shortest
+    alternative is longest is returned.
+
+    Args:
+        pattern: Regular expression, matched case-insensitively
+
+    Returns:
+        Lowercase ASCII literals, or None if the pattern has no usable literal
+    """
+    try:
+        parsed = sre_parse.parse(pattern, re.IGNORECASE)
+    except re.error:
+        return None
+
+    runs: list[list[str]] = []
+    current = [""]
+
+    def end_run():
+        nonlocal current
+        if current[0]:
+            runs.append(current)
+        current = [""]
+
+    items = list(parsed)
+    while items:
+        op, av = items.pop(0)
+        if op is sre_parse.LITERAL:
+            chars = [chr(av)]
+        elif op is sre_parse.IN and all(item_op is sre_parse.LITERAL for item_op, _ in av):
+            chars = sorted({chr(code).lower() for _, code in av})
+        elif op is sre_parse.SUBPATTERN and not av[1] and not av[2]:
+            # Plain group without flag changes: continue with its contents
+            items[:0] = list(av[3])
+            continue
+        else:
+            end_run()
+            continue
+
+        if not all(char.isascii() for char in chars) or (
+            len(current) * len(chars) > _MAX_LITERAL_ALTERNATIVES
+        ):
+            end_run()
+            continue
+        current = [prefix + char.lower() for prefix in current for char in chars]
+    end_run()
+
+    if not runs:
+        return None
+    return max(runs, key=lambda run: (min(map(len, run)), -len(run)))
+
+
+class LiteralFilter:
+    """Finds the rules whose required literals occur in a text."""
+
+    def __init__(self, patterns: list[str]):
+        """
+        Build the filter.
+
+        Args:
+            patterns: Rule patterns, matched case-insensitively
+        """
+        self._literals = [required_literals(pattern) for pattern in patterns]
+        # Rules without a literal can't be ruled out and always run
+        self._always = [i for i, literals in enumerate(self._literals) if literals is None]
+        # Every (literal, rule) pair, so the search without Aho-Corasick is a
+        # single flat loop
+        self._literal_rules = [
+            (literal, i) for i, literals in enumerate(self._literals) for literal in literals or ()
+        ]
+
+        self._automaton = None
+        if ahocorasick is not None and len(self._always) < len(patterns):
+            rules_by_literal: dict[str, list[int]] = {}
+            for i, literals in enumerate(self._literals):
+                for literal in literals or ():
+                    rules_by_literal.setdefault(literal, []).append(i)
+            self._automaton = ahocorasick.Automaton()
+            for literal, rule_ids in rules_by_literal.items():
+                self._automaton.add_word(literal, tuple(rule_ids))
+            self._automaton.make_automaton()
+
+    def candidates(self, text: str) -> list[int] | range:
+        """
+        Get the rules that may match the text.
+
+        Args:
+            text: Text to check
+
+        Returns:
+            Sorted rule indexes
+        """
+        if not text.isascii():
+            # Case-insensitive matching also folds non-ASCII characters onto
+            # ASCII ones (e.g. the Kelvin sign onto "k"), so keep every rule
+            return range(len(self._literals))
+
+        lowered = text.lower()
+        if self._automaton is not None:
+            hits = set(self._always)
+            for _, rule_ids in self._automaton.iter(lowered):
+                hits.update(rule_ids)
+            return sorted(hits)
+
+        hits = {i for literal, i in self._literal_rules if literal in lowered}
+        if not hits:
+            return list(self._always)
+        hits.update(self._always)
+        return sorted(hits)
@@ -1,19 +1,93 @@
 """Security scanning engine for detecting sensitive information."""
 
+import functools
 import json
+import queue
 import re
+import sys
+import threading
+from collections.abc import Iterator
+from dataclasses import dataclass
 from typing import Any
 
-from .config import ActionType, GatewayConfig, ScanRule
-from .parser import ParsedMessage, create_error_response
+from .config import ActionType, GatewayConfig, ScanDirection, ScanRule, Severity
+from .logger import current_timestamp
+from .parser import ParsedMessage
+from .prefilter import DIGIT_SHAPES, LiteralFilter, digit_shape
+
+try:
+    import hyperscan
+except ImportError:  # Optional dependency, see the "hyperscan" extra
+    hyperscan = None
+
+
+# Block responses only differ in their id and violations, so they are put
+# together from these parts (the JSON create_error_response() would give)
+_BLOCK_RESPONSE_START = '{"jsonrpc":"2.0","id":'
+_BLOCK_RESPONSE_ERROR = (
+    ',"error":{"code":-32000,"message":"Request blocked by security policy",'
+    '"data":{"reason":"Security violations detected","violations":['
+)
+_BLOCK_RESPONSE_END = '],"contact":"Contact your administrator for more information"}}}'
+
+
+# Alerts waiting for webhook delivery beyond this are dropped
+WEBHOOK_QUEUE_SIZE = 1000
+
+
+# Encodes values as compact JSON
+_compact_json = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+# Severity and action names as stored in violations, and the actions checked
+# for every match (enum members and values are slow to look up)
+_SEVERITY_NAMES = {severity: severity.value for severity in Severity}
+_ACTION_NAMES = {action: action.value for action in ActionType}
+_BLOCK = ActionType.BLOCK
+_REDACT = ActionType.REDACT
+
+# ASCII characters \s matches in re but not in Hyperscan
+_HYPERSCAN_MISSED_SPACE = "\x1c\x1d\x1e\x1f"
+
+
+@dataclass(slots=True)
+class ScanViolation:
+    """A match of a scan rule in a message."""
+
+    rule_name: str
+    severity: str
+    action: str
+    description: str
+    match: str
+    match_start: int
+    match_end: int
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Get the violation as a dict, e.g. for encoding as JSON.
+
+        Returns:
+            Dict with one key per field
+        """
+        return {
+            "rule_name": self.rule_name,
+            "severity": self.severity,
+            "action": self.action,
+            "description": self.description,
+            "match": self.match,
+            "match_start": self.match_start,
+            "match_end": self.match_end,
+        }
 
 
 class ScanResult:
     """Result of a security scan."""
 
+    # One result is created per scanned message
+    __slots__ = ("violations", "should_block", "modified_message")
+
     def __init__(self):
         """Initialize scan result."""
-        self.violations: list[dict[str, Any]] = []
+        self.violations: list[ScanViolation] = []
         self.should_block = False
         self.modified_message: str | None = None
 
@@ -34,19 +108,41 @@ class ScanResult:
             match_end: End position of match
         """
         self.violations.append(
-            {
-                "rule_name": rule.name,
-                "severity": rule.severity.value,
-                "action": rule.action.value,
-                "description": rule.description,
-                "match": match,
-                "match_start": match_start,
-                "match_end": match_end,
-            }
+            ScanViolation(
+                rule.name,
+                _SEVERITY_NAMES[rule.severity],
+                _ACTION_NAMES[rule.action],
+                rule.description,
+                match,
+                match_start,
+                match_end,
+            )
         )
 
         # If any rule says to block, we block
-        if rule.action == ActionType.BLOCK:
+        if rule.action == _BLOCK:
+            self.should_block = True
+
+    def add_matches(self, rule: ScanRule, matches: list[re.Match]):
+        """
+        Add one violation per match of a rule to the result.
+
+        Args:
+            rule: The rule that was violated
+            matches: The rule's matches in the scanned text
+        """
+        name = rule.name
+        severity = _SEVERITY_NAMES[rule.severity]
+        action = _ACTION_NAMES[rule.action]
+        description = rule.description
+        self.violations.extend(
+            [
+                ScanViolation(name, severity, action, description, m.group(0), m.start(), m.end())
+                for m in matches
+            ]
+        )
+
+        if rule.action == _BLOCK:
             self.should_block = True
 
     def has_violations(self) -> bool:
@@ -54,6 +150,31 @@ class ScanResult:
         return len(self.violations) > 0
 
 
+class _NoViolations(ScanResult):
+    """Result of a scan that found nothing, shared by all such scans."""
+
+    __slots__ = ()
+
+    def __init__(self):
+        """Initialize the (only) instance."""
+        object.__setattr__(self, "violations", ())
+        object.__setattr__(self, "should_block", False)
+        object.__setattr__(self, "modified_message", None)
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError("NO_VIOLATIONS is shared and can't be changed")
+
+    def add_violation(self, *args, **kwargs):
+        raise AttributeError("NO_VIOLATIONS is shared and can't be changed")
+
+    add_matches = add_violation
+
+
+# Returned for every scan without violations, so clean messages don't
+# allocate a result
+NO_VIOLATIONS = _NoViolations()
+
+
 class SecurityScanner:
     """Security scanner for MCP messages."""
 
@@ -65,22 +186,182 @@ class SecurityScanner:
             config: Gateway configuration
         """
         self.config = config
+        self._violation_details: dict[tuple[str, str, str], str] = {}
         self._compile_patterns()
 
     def _compile_patterns(self):
-        """Pre-compile regex patterns for efficiency."""
+        """Collect the pre-compiled patterns of all enabled rules."""
         self.compiled_rules = []
+        self._excluded_rules: dict[str, set[int]] = {}
+        self._digit_shapes = []
+        self._literal_filter = LiteralFilter([])
+        self._hs_db = None
+        self._hs_local = threading.local()
         if not self.config.scanning.enabled:
             return
 
-        for rule in self.config.scanning.rules:
-            if rule.enabled:
-                try:
-                    compiled = re.compile(rule.pattern, re.IGNORECASE)
-                    self.compiled_rules.append((rule, compiled))
-                except re.error as e:
-                    # Log error but continue with other rules
-                    print(f"Error compiling pattern for rule {rule.name}: {e}")
+        # Patterns are compiled when the rules are loaded, so this only
+        # drops disabled rules once instead of on every message. They are
+        # deliberately not combined into one alternation: re doesn't share
+        # work between branches, so a combined search is slower than the
+        # separate searches (which each skip ahead to their literal prefix),
+        # and an alternation only reports one of several overlapping matches.
+        self.compiled_rules = [
+            (rule, rule.compiled) for rule in self.config.scanning.rules if rule.enabled
+        ]
+
+        # Rules limited to one direction are left out before the other
+        # direction's regex searches
+        for direction in (ScanDirection.REQUEST, ScanDirection.RESPONSE):
+            self._excluded_rules[direction.value] = {
+                rule_id
+                for rule_id, (rule, _) in enumerate(self.compiled_rules)
+                if rule.direction not in (ScanDirection.BOTH, direction)
+            }
+
+        # Digit-structured rules (SSN, credit card) get a cheaper check
+        # that is run before their regex
+        self._digit_shapes = [DIGIT_SHAPES.get(rule.pattern) for rule, _ in self.compiled_rules]
+
+        # Without Hyperscan, rules are ruled out by the literals that every
+        # match of their pattern contains (e.g. "AKIA", "@")
+        self._literal_filter = LiteralFilter([rule.pattern for rule, _ in self.compiled_rules])
+
+        self._hs_db = self._compile_hyperscan()
+
+    def _compile_hyperscan(self):
+        """
+        Compile all enabled rules into a single Hyperscan database.
+
+        The database is only used to find out which rules can match a message,
+        so patterns are compiled in prefilter mode (never misses a match). The
+        exact match spans still come from the compiled Python patterns.
+
+        Returns:
+            Hyperscan database, or None if Hyperscan is not available
+        """
+        if hyperscan is None or not self.compiled_rules:
+            return None
+
+        try:
+            return _hyperscan_database(tuple(rule.pattern for rule, _ in self.compiled_rules))
+        except hyperscan.error as e:
+            print(f"Error compiling Hyperscan database, falling back to re: {e}", file=sys.stderr)
+            return None
+
+    def scans_direction(self, direction: str) -> bool:
+        """
+        Check whether messages in a direction are scanned at all.
+
+        Args:
+            direction: Message direction (client->server or server->client)
+
+        Returns:
+            True if scanning is enabled for the direction and a rule applies
+        """
+        scanning = self.config.scanning
+        if not (scanning.scan_request if direction == "client->server" else scanning.scan_response):
+            return False
+        return len(self._excluded_rules.get(direction, ())) < len(self.compiled_rules)
+
+    def may_match(self, text: str, direction: str | None = None) -> bool:
+        """
+        Check whether any rule can match somewhere in a text.
+
+        Only the prefilters are run, and they never miss a match, so a False
+        result rules out every message whose text is part of the text.
+
+        Args:
+            text: Text to check, e.g. the joined text of several messages
+            direction: Message direction, to leave out rules for the other one
+
+        Returns:
+            False if no rule can match the text
+        """
+        return bool(self._candidate_rules(text, direction))
+
+    def _candidate_rules(
+        self, text: str, direction: str | None = None
+    ) -> list[tuple[ScanRule, re.Pattern]]:
+        """
+        Get the compiled rules that may match the text.
+
+        Args:
+            text: Text to scan
+            direction: Message direction, to leave out rules for the other one
+
+        Returns:
+            List of (rule, pattern) tuples, in rule order
+        """
+        rule_ids = self._hyperscan_hits(text)
+        if rule_ids is None:
+            rule_ids = self._literal_filter.candidates(text)
+
+        excluded = self._excluded_rules.get(direction)
+        if excluded:
+            rule_ids = [rule_id for rule_id in rule_ids if rule_id not in excluded]
+
+        shape = None
+        if any(self._digit_shapes[rule_id] is not None for rule_id in rule_ids):
+            shape = digit_shape(text)
+
+        return [
+            self.compiled_rules[rule_id]
+            for rule_id in rule_ids
+            if shape is None
+            or self._digit_shapes[rule_id] is None
+            or self._digit_shapes[rule_id].search(shape)
+        ]
+
+    def _iter_matches(
+        self, text: str, direction: str | None = None
+    ) -> Iterator[tuple[ScanRule, re.Match]]:
+        """
+        Find the matches of all rules in a text.
+
+        Args:
+            text: Text to scan
+            direction: Message direction, to leave out rules for the other one
+
+        Yields:
+            (rule, match) tuples, in rule order and then text order
+        """
+        for rule, pattern in self._candidate_rules(text, direction):
+            for match in pattern.finditer(text):
+                yield rule, match
+
+    def _hyperscan_hits(self, text: str) -> list[int] | None:
+        """
+        Find the rules that can match the text using Hyperscan.
+
+        Args:
+            text: Text to scan
+
+        Returns:
+            Sorted indexes into compiled_rules, or None if Hyperscan can't be used
+        """
+        if self._hs_db is None:
+            return None
+
+        # Hyperscan's \w and \d go by an older Unicode version than re, and
+        # its \s leaves out \x1c-\x1f, so it could miss matches in such text
+        if not text.isascii() or any(c in text for c in _HYPERSCAN_MISSED_SPACE):
+            return None
+        data = text.encode("ascii")
+
+        # Scratch space must not be shared between threads
+        scratch = getattr(self._hs_local, "scratch", None)
+        if scratch is None:
+            scratch = self._hs_local.scratch = hyperscan.Scratch(self._hs_db)
+
+        hits: set[int] = set()
+        self._hs_db.scan(
+            data,
+            match_event_handler=_record_hyperscan_match,
+            context=hits,
+            scratch=scratch,
+        )
+        return sorted(hits)
 
     def scan_message(
         self,
@@ -95,42 +376,43 @@ class SecurityScanner:
             direction: Message direction (client->server or server->client)
 
         Returns:
-            Scan result with any violations found
+            Scan result with any violations found (NO_VIOLATIONS if none)
         """
-        result = ScanResult()
-
         if not self.config.scanning.enabled:
-            return result
+            return NO_VIOLATIONS
 
         # Check if we should scan this direction
         if direction == "client->server" and not self.config.scanning.scan_request:
-            return result
+            return NO_VIOLATIONS
         if direction == "server->client" and not self.config.scanning.scan_response:
-            return result
+            return NO_VIOLATIONS
 
         # Scan the raw message
         message_text = message.raw_message
-        redacted_text = message_text
-
-        for rule, pattern in self.compiled_rules:
-            for match in pattern.finditer(message_text):
-                result.add_violation(
-                    rule=rule,
-                    match=match.group(0),
-                    match_start=match.start(),
-                    match_end=match.end(),
-                )
-
-                # If action is REDACT, replace the match
-                if rule.action == ActionType.REDACT:
-                    redacted_text = redacted_text.replace(
-                        match.group(0),
-                        f"[REDACTED:{rule.name}]",
-                    )
+        result = None
+        redactions: list[tuple[int, int, str]] = []
+
+        # Violations are added a rule at a time, as there can be many
+        # matches of one rule (e.g. all emails in a document)
+        for rule, pattern in self._candidate_rules(message_text, direction):
+            matches = list(pattern.finditer(message_text))
+            if not matches:
+                continue
+            if result is None:
+                result = ScanResult()
+            result.add_matches(rule, matches)
+
+            # If action is REDACT, remember where to replace the matches
+            if rule.action == _REDACT:
+                label = f"[REDACTED:{rule.name}]"
+                redactions.extend([(m.start(), m.end(), label) for m in matches])
+
+        if result is None:
+            return NO_VIOLATIONS
 
         # If we redacted anything, update the modified message
-        if redacted_text != message_text:
-            result.modified_message = redacted_text
+        if redactions:
+            result.modified_message = _redact(message_text, redactions)
 
         return result
 
@@ -144,16 +426,10 @@ class SecurityScanner:
         Returns:
             List of (rule, match) tuples
         """
-        violations = []
-
         if not self.config.scanning.enabled:
-            return violations
-
-        for rule, pattern in self.compiled_rules:
-            for match in pattern.finditer(text):
-                violations.append((rule, match.group(0)))
+            return []
 
-        return violations
+        return [(rule, match.group(0)) for rule, match in self._iter_matches(text)]
 
     def create_block_response(
         self,
@@ -170,27 +446,94 @@ class SecurityScanner:
         Returns:
             JSON-RPC error response as string
         """
-        violation_details = [
-            {
-                "rule": v["rule_name"],
-                "severity": v["severity"],
-                "description": v["description"],
-            }
-            for v in scan_result.violations
-        ]
-
-        return create_error_response(
-            request_id=original_message.message_id,
-            code=-32000,  # Server error
-            message="Request blocked by security policy",
-            data={
-                "reason": "Security violations detected",
-                "violations": violation_details,
-                "contact": "Contact your administrator for more information",
-            },
+        # Violations of the same rule always encode the same way
+        details = []
+        for v in scan_result.violations:
+            key = (v.rule_name, v.severity, v.description)
+            detail = self._violation_details.get(key)
+            if detail is None:
+                detail = self._violation_details[key] = _compact_json(
+                    {"rule": key[0], "severity": key[1], "description": key[2]}
+                )
+            details.append(detail)
+
+        return "".join(
+            (
+                _BLOCK_RESPONSE_START,
+                _compact_json(original_message.message_id),
+                _BLOCK_RESPONSE_ERROR,
+                ",".join(details),
+                _BLOCK_RESPONSE_END,
+            )
         )
 
 
+def _redact(text: str, redactions: list[tuple[int, int, str]]) -> str:
+    """
+    Replace spans of a text in a single pass.
+
+    Overlapping spans are merged into the replacement of the first one, so no
+    part of any span is left in the result.
+
+    Args:
+        text: Text to redact
+        redactions: (start, end, replacement) tuples, in any order
+
+    Returns:
+        Redacted text
+    """
+    parts = []
+    pos = 0
+    for start, end, replacement in sorted(redactions):
+        if start < pos:
+            pos = max(pos, end)
+            continue
+        parts += (text[pos:start], replacement)
+        pos = end
+    parts.append(text[pos:])
+    return "".join(parts)
+
+
+@functools.lru_cache(maxsize=8)
+def _hyperscan_database(patterns: tuple[str, ...]):
+    """
+    Compile patterns into a Hyperscan prefilter database.
+
+    Compiling takes a while (about 0.3s for the default rules), so databases
+    are cached by their patterns. Scanners for the same rules share one; a
+    database isn't changed by scanning (scratch space is per scanner).
+
+    Args:
+        patterns: Rule patterns, whose indexes become the match ids
+
+    Returns:
+        Hyperscan database
+
+    Raises:
+        hyperscan.error: If a pattern can't be compiled
+    """
+    flags = (
+        hyperscan.HS_FLAG_CASELESS
+        | hyperscan.HS_FLAG_UTF8
+        | hyperscan.HS_FLAG_UCP
+        | hyperscan.HS_FLAG_SINGLEMATCH
+        | hyperscan.HS_FLAG_PREFILTER
+    )
+    database = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+    database.compile(
+        expressions=[pattern.encode("utf-8") for pattern in patterns],
+        ids=list(range(len(patterns))),
+        elements=len(patterns),
+        flags=flags,
+    )
+    return database
+
+
+def _record_hyperscan_match(rule_id: int, start: int, end: int, flags: int, hits: set[int]):
+    """Hyperscan match callback that records which rule matched."""
+    hits.add(rule_id)
+
+
 class AlertManager:
     """Manages security alerts."""
 
@@ -203,6 +546,11 @@ class AlertManager:
         """
         self.config = config
 
+        # Webhooks are posted from a background thread, started with the
+        # first alert, so a slow endpoint never holds up forwarding
+        self._webhook_queue: queue.Queue[dict[str, Any] | None] = queue.Queue(WEBHOOK_QUEUE_SIZE)
+        self._webhook_thread: threading.Thread | None = None
+
     def send_alert(
         self,
         message: ParsedMessage,
@@ -228,7 +576,7 @@ class AlertManager:
             "direction": direction,
             "message_type": message.message_type.value,
             "method": message.method,
-            "violations": scan_result.violations,
+            "violations": [violation.to_dict() for violation in scan_result.violations],
         }
 
         # Send to webhook if configured
@@ -241,22 +589,58 @@ class AlertManager:
 
     def _send_webhook(self, alert_data: dict[str, Any]):
         """
-        Send alert to webhook.
+        Queue an alert for the webhook.
 
         Args:
             alert_data: Alert data to send
         """
+        if self._webhook_thread is None:
+            self._webhook_thread = threading.Thread(
+                target=self._deliver_webhooks, name="webhook-alerts", daemon=True
+            )
+            self._webhook_thread.start()
+
         try:
-            import requests
+            self._webhook_queue.put_nowait(alert_data)
+        except queue.Full:
+            print("Webhook alert queue is full, dropping alert", file=sys.stderr)
+
+    def _deliver_webhooks(self):
+        """Post queued alerts to the webhook until close() is called."""
+        import requests
+
+        # One session for all alerts, so the connection is reused
+        with requests.Session() as session:
+            while True:
+                alert_data = self._webhook_queue.get()
+                if alert_data is None:
+                    return
+                try:
+                    response = session.post(
+                        self.config.alerting.webhook_url,
+                        json=alert_data,
+                        timeout=5,
+                    )
+                    response.raise_for_status()
+                except Exception as e:
+                    # Our stdout carries the client's messages
+                    print(f"Error sending webhook alert: {e}", file=sys.stderr)
 
-            response = requests.post(
-                self.config.alerting.webhook_url,
-                json=alert_data,
-                timeout=5,
-            )
-            response.raise_for_status()
-        except Exception as e:
-            print(f"Error sending webhook alert: {e}")
+    def close(self, timeout: float = 5.0):
+        """
+        Deliver queued webhook alerts and stop the delivery thread.
+
+        Args:
+            timeout: Seconds to wait for queued alerts to be delivered
+        """
+        if self._webhook_thread is None:
+            return
+        try:
+            self._webhook_queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._webhook_thread.join(timeout)
+        self._webhook_thread = None
 
     def _send_email(self, alert_data: dict[str, Any]):
         """
@@ -271,6 +655,4 @@ class AlertManager:
 
     def _get_timestamp(self) -> str:
         """Get current timestamp."""
-        from datetime import datetime
-
-        return datetime.now().isoformat()
+        return current_timestamp()
@@ -0,0 +1,89 @@
+"""Tests for the compressed audit log."""
+
+import gc
+import json
+import weakref
+
+import pytest
+
+from mcp_gateway import auditlog
+from mcp_gateway.config import GatewayConfig
+from mcp_gateway.logger import GatewayLogger
+from mcp_gateway.parser import MessageParser
+
+pytest.importorskip("zstandard")
+
+
+def test_write_and_read_reversed(tmp_path, monkeypatch):
+    """Test that entries come back newest first across several frames."""
+    monkeypatch.setattr(auditlog, "FRAME_MAX_ENTRIES", 3)
+    path = tmp_path / "audit.jsonl.zst"
+    writer = auditlog.ZstdAuditWriter(path)
+    for i in range(10):
+        writer.write({"timestamp": f"t{i}", "server": "a" if i < 6 else "b", "id": i})
+    writer.close()
+
+    index = auditlog.read_index(path)
+    assert [entry["entries"] for _, entry in index] == [3, 3, 3, 1]
+
+    lines = list(auditlog.iter_lines_reversed(path))
+    assert [json.loads(line)["id"] for line in lines] == list(reversed(range(10)))
+
+    # The first two frames only hold entries for server "a" and are skipped
+    lines = list(auditlog.iter_lines_reversed(path, server="b"))
+    assert [json.loads(line)["id"] for line in lines] == [9, 8, 7, 6]
+
+
+def test_truncated_frame_ignored(tmp_path):
+    """Test that a frame cut short by an interrupted write is not read."""
+    path = tmp_path / "audit.jsonl.zst"
+    writer = auditlog.ZstdAuditWriter(path)
+    writer.write({"id": 1})
+    writer.flush()
+    writer.write({"id": 2})
+    writer.close()
+
+    path.write_bytes(path.read_bytes()[:-3])
+    lines = list(auditlog.iter_lines_reversed(path))
+    assert [json.loads(line) for line in lines] == [{"id": 1}]
+
+
+def test_logger_flush_writes_due_frame(tmp_path, monkeypatch):
+    """Test that a frame is written once due, without another entry arriving."""
+    now = [1000.0]
+    monkeypatch.setattr(auditlog.time, "monotonic", lambda: now[0])
+    config = GatewayConfig()
+    config.logging.enabled = False
+    config.auditing.audit_log = tmp_path / "audit.jsonl"
+    config.auditing.compression = "zstd"
+    logger = GatewayLogger(config)
+    (message,) = MessageParser().feed('{"jsonrpc": "2.0", "id": 1, "method": "ping"}\n')
+    path = auditlog.compressed_path(config.auditing.audit_log)
+
+    assert logger.flush_due_in() is None
+    logger.audit("client->server", message)
+    logger.flush()
+    assert not path.exists()
+    assert logger.flush_due_in() == auditlog.FRAME_MAX_AGE
+
+    now[0] += auditlog.FRAME_MAX_AGE
+    assert logger.flush_due_in() == 0
+    logger.flush()
+    assert [entry["entries"] for _, entry in auditlog.read_index(path)] == [1]
+    assert logger.flush_due_in() is None
+    logger.close()
+
+
+def test_unclosed_writer_not_kept_alive(tmp_path):
+    """Test that a writer that is dropped unclosed is freed and writes its entries."""
+    path = tmp_path / "audit.jsonl.zst"
+    writer = auditlog.ZstdAuditWriter(path)
+    writer.write({"id": 1})
+    assert writer in auditlog._open_writers
+
+    ref = weakref.ref(writer)
+    del writer
+    gc.collect()
+
+    assert ref() is None
+    assert [json.loads(line) for line in auditlog.iter_lines_reversed(path)] == [{"id": 1}]
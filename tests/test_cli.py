@@ -0,0 +1,40 @@
+"""Tests for CLI helpers."""
+
+import argparse
+
+import pytest
+
+from mcp_gateway import cli
+from mcp_gateway.config import GatewayConfig
+
+
+@pytest.mark.parametrize(
+    "content", ["", "a", "a\n", "a\n\nb\n\n", "first line\nsecond\nthird line\n"]
+)
+def test_tail_lines(tmp_path, monkeypatch, content):
+    """Test that reading backwards in chunks gives the same lines as readlines()."""
+    monkeypatch.setattr(cli, "TAIL_CHUNK_SIZE", 4)
+    path = tmp_path / "audit.jsonl"
+    path.write_text(content)
+    expected = [line.rstrip("\n").encode() for line in content.splitlines(True)]
+
+    for n in range(1, 6):
+        assert cli._tail_lines(path, n) == expected[-n:]
+    assert cli._tail_lines(path, 0) == []
+
+
+def test_audit_rejects_foreign_compressed_log(tmp_path, monkeypatch, capsys):
+    """Test that a .zst file that isn't a compressed audit log gives a short error."""
+    pytest.importorskip("zstandard")
+    config = GatewayConfig()
+    config.auditing.audit_log = tmp_path / "audit.jsonl"
+    config.auditing.compression = "zstd"
+    (tmp_path / "audit.jsonl.zst").write_bytes(b"not an audit log")
+    monkeypatch.setattr(GatewayConfig, "load_or_create_default", lambda: config)
+
+    args = argparse.Namespace(server=None, method=None, lines=50, pretty=False)
+    with pytest.raises(SystemExit) as exc_info:
+        cli.cmd_audit(args)
+
+    assert exc_info.value.code == 1
+    assert capsys.readouterr().err.startswith("Error reading audit log: Not a compressed audit log")
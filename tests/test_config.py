@@ -0,0 +1,59 @@
+"""Tests for configuration loading."""
+
+import json
+import os
+
+import pytest
+from pydantic import ValidationError
+
+from mcp_gateway.config import GatewayConfig
+
+
+def test_load_from_file_cached(tmp_path):
+    """Test that loading returns independent copies and sees file changes."""
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps({"scanning": {"scan_request": False}}))
+
+    first = GatewayConfig.load_from_file(config_path)
+    first.scanning.scan_response = False
+    second = GatewayConfig.load_from_file(config_path)
+    assert second is not first
+    assert second.scanning.scan_request is False
+    assert second.scanning.scan_response is True
+
+    config_path.write_text(json.dumps({"scanning": {"scan_request": True}}))
+    stat = config_path.stat()
+    os.utime(config_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert GatewayConfig.load_from_file(config_path).scanning.scan_request is True
+
+
+def test_load_from_file_sees_env_changes(tmp_path, monkeypatch):
+    """Test that a cached config is not reused after the environment changes."""
+    config_path = tmp_path / "config.json"
+    config_path.write_text("{}")
+
+    assert GatewayConfig.load_from_file(config_path).metrics.enabled is True
+    monkeypatch.setenv("MCP_GATEWAY_METRICS", '{"enabled": false}')
+    assert GatewayConfig.load_from_file(config_path).metrics.enabled is False
+
+
+def test_env_file_and_precedence(tmp_path, monkeypatch):
+    """Test that values merge from .env, environment and arguments, in that order."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / ".env").write_text(
+        "# metrics settings\n"
+        'export MCP_GATEWAY_METRICS=\'{"enabled": false, "collect_latency": false}\'\n'
+    )
+    monkeypatch.setenv("mcp_gateway_metrics", '{"enabled": true}')
+
+    metrics = GatewayConfig(metrics={"collect_message_counts": False}).metrics
+    assert metrics.enabled is True
+    assert metrics.collect_latency is False
+    assert metrics.collect_message_counts is False
+
+
+def test_audit_compression_validated():
+    """Test that an unknown audit compression is rejected instead of ignored."""
+    assert GatewayConfig(auditing={"compression": "zstd"}).auditing.compression == "zstd"
+    with pytest.raises(ValidationError):
+        GatewayConfig(auditing={"compression": "zstandard"})
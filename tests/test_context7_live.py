@@ -2,6 +2,7 @@
 """Live test with Context7 MCP server through gateway."""
 
 import json
+import os
 import subprocess
 import sys
 import time
@@ -15,22 +16,43 @@ def send_message(process, message):
     process.stdin.flush()
 
 
+# Data read after the last complete line, per process
+_pending_output = {}
+
+
 def read_response(process, timeout=5):
     """Read a response from the process."""
     import select
 
-    # Check if data is available
-    readable, _, _ = select.select([process.stdout], [], [], timeout)
-
-    if readable:
-        line = process.stdout.readline().decode().strip()
-        if line:
-            try:
-                return json.loads(line)
-            except json.JSONDecodeError as e:
-                print(f"Failed to parse response: {e}")
-                print(f"Raw line: {line}")
-                return None
+    # stdout is unbuffered, where readline() reads one byte per syscall, so
+    # read whatever is available and keep the rest for the next response
+    fd = process.stdout.fileno()
+    pending = _pending_output.setdefault(process, bytearray())
+    deadline = time.monotonic() + timeout
+    end = pending.find(b"\n")
+    while end == -1:
+        # Check if data is available
+        remaining = deadline - time.monotonic()
+        readable, _, _ = select.select([fd], [], [], max(remaining, 0))
+        if not readable:
+            return None
+        chunk = os.read(fd, 65536)
+        if not chunk:
+            return None
+        # Only the new data can hold the end of the line
+        searched = len(pending)
+        pending += chunk
+        end = pending.find(b"\n", searched)
+
+    line = pending[:end].decode().strip()
+    del pending[: end + 1]
+    if line:
+        try:
+            return json.loads(line)
+        except json.JSONDecodeError as e:
+            print(f"Failed to parse response: {e}")
+            print(f"Raw line: {line}")
+            return None
     return None
 
 
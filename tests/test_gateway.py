@@ -0,0 +1,76 @@
+"""Tests for the stdio gateway."""
+
+import json
+import os
+import selectors
+
+import pytest
+
+from mcp_gateway.config import DEFAULT_SCAN_RULES, GatewayConfig
+from mcp_gateway.gateway import StdioGateway
+
+
+@pytest.mark.parametrize("scan", [True, False])
+def test_invalid_utf8_keeps_other_messages(tmp_path, scan):
+    """Test that an invalid byte in one message doesn't drop the rest of the read."""
+    config = GatewayConfig()
+    config.logging.enabled = False
+    config.auditing.audit_log = tmp_path / "audit.jsonl"
+    if scan:
+        config.scanning.rules = DEFAULT_SCAN_RULES
+    gateway = StdioGateway(["server"], config)
+    read_fd, gateway._stdout_fd = os.pipe()
+
+    block = (
+        b'{"jsonrpc": "2.0", "id": 1, "result": "one"}\n'
+        b'{"jsonrpc": "2.0", "id": 2, "result": "t\xffo"}\n'
+        b'{"jsonrpc": "2.0", "id": 3, "result": "three"}\n'
+    )
+    gateway._forward(block, "server->client")
+    os.close(gateway._stdout_fd)
+    with os.fdopen(read_fd, "rb") as f:
+        output = f.read()
+    gateway.logger.close()
+
+    lines = output.decode("utf-8", errors="replace").splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [1, 2, 3]
+    if not scan:
+        # Unscanned lines go through as they were read
+        assert output == block
+    assert gateway.metrics.get_metrics()["messages_processed"] == 3
+
+
+@pytest.mark.parametrize("scan", [True, False])
+def test_final_message_without_newline_forwarded(tmp_path, scan):
+    """Test that a final message spread over lines and lacking its newline is forwarded."""
+    config = GatewayConfig()
+    config.logging.enabled = False
+    config.auditing.audit_log = tmp_path / "audit.jsonl"
+    if scan:
+        config.scanning.rules = DEFAULT_SCAN_RULES
+    gateway = StdioGateway(["server"], config)
+    read_fd, gateway._stdout_fd = os.pipe()
+    gateway._selector = selectors.DefaultSelector()
+    server_stdout_fd, server_stdout_write_fd = os.pipe()
+    gateway._server_stdout_fd = server_stdout_fd
+    gateway._selector.register(server_stdout_fd, selectors.EVENT_READ)
+
+    # A pretty-printed message whose last line isn't terminated
+    chunks = [b'{\n  "jsonrpc": "2.0",\n', b'  "id": 1,\n  "result": "one"\n}']
+    for chunk in chunks:
+        block = gateway._server_lines.feed(chunk)
+        if block:
+            gateway._forward(block, "server->client")
+    gateway._close_server_stdout()
+    os.close(gateway._stdout_fd)
+    with os.fdopen(read_fd, "rb") as f:
+        output = f.read()
+    os.close(server_stdout_fd)
+    os.close(server_stdout_write_fd)
+    gateway.logger.close()
+
+    if scan:
+        assert json.loads(output) == {"jsonrpc": "2.0", "id": 1, "result": "one"}
+    else:
+        assert output == b"".join(chunks)
+    assert gateway.metrics.get_metrics()["messages_processed"] == 1
@@ -0,0 +1,254 @@
+"""Tests for logging and metrics."""
+
+import gc
+import json
+import weakref
+from collections import Counter
+from datetime import datetime
+
+from mcp_gateway import logger as logger_module
+from mcp_gateway.config import GatewayConfig, LogLevel
+from mcp_gateway.logger import GatewayLogger, MetricsCollector, current_timestamp
+from mcp_gateway.parser import MessageParser
+from mcp_gateway.scanner import ScanViolation
+
+
+def test_record_batch_matches_single_calls():
+    """Test that recording a batch gives the same metrics as one call per message."""
+    messages = MessageParser().feed(
+        '{"jsonrpc": "2.0", "id": 1, "method": "tools/call", "params": {"name": "echo"}}\n'
+        '{"jsonrpc": "2.0", "method": "notifications/initialized"}\n'
+        '{"jsonrpc": "2.0", "id": 2, "method": "tools/call", "params": {"name": "echo"}}\n'
+    )
+    config = GatewayConfig()
+
+    single = MetricsCollector(config)
+    for message in messages:
+        single.record_message(message, "client->server")
+    single.record_violation("aws-access-key", True)
+    single.record_violation("email-address", False)
+    single.record_violation("aws-access-key", True)
+    single.record_latency(1.5)
+
+    batch = MetricsCollector(config)
+    batch.record_batch(
+        "client->server",
+        messages,
+        Counter({"aws-access-key": 2, "email-address": 1}),
+        blocked=2,
+        latency_ms=1.5,
+    )
+
+    assert batch.get_metrics() == single.get_metrics()
+
+
+def test_minimal_audit_entry_matches_json(tmp_path):
+    """Test that entries formatted without json.dumps decode to the same entry."""
+    config = GatewayConfig()
+    config.logging.enabled = False
+    config.auditing.audit_log = tmp_path / "audit.jsonl"
+    config.auditing.include_message_content = False
+    logger = GatewayLogger(config)
+
+    messages = MessageParser().feed(
+        '{"jsonrpc": "2.0", "id": "a\\"b", "method": "tools/call", "params": {"name": "écho"}}\n'
+        '{"jsonrpc": "2.0", "id": 2, "method": "resources/read", "params": {"uri": "file:///x"}}\n'
+        '{"jsonrpc": "2.0", "id": 3, "result": {}}\n'
+    )
+    for message in messages:
+        logger.audit("client->server", message, server_name="mock", blocked=message.message_id == 2)
+    logger.flush()
+
+    lines = (tmp_path / "audit.jsonl").read_text().splitlines()
+    entries = [json.loads(line) for line in lines]
+    assert lines == [json.dumps(entry) for entry in entries]
+    assert [entry.get("tool") for entry in entries] == ["écho", None, None]
+    assert entries[1]["resource_uri"] == "file:///x"
+    assert entries[1]["blocked"] is True
+    assert "method" not in entries[2]
+
+
+def test_audit_entry_error_content(tmp_path):
+    """Test that audit entries with message content include the error object."""
+    config = GatewayConfig()
+    config.logging.enabled = False
+    config.auditing.audit_log = tmp_path / "audit.jsonl"
+    config.auditing.include_message_content = True
+    logger = GatewayLogger(config)
+
+    (message,) = MessageParser().feed(
+        '{"jsonrpc": "2.0", "id": 1, "error": {"code": -32601, "message": "Not found", "data": [1]}}\n'
+    )
+    logger.audit("server->client", message, server_name="mock")
+    logger.flush()
+
+    entry = json.loads((tmp_path / "audit.jsonl").read_text())
+    assert entry["error"] == {"code": -32601, "message": "Not found", "data": [1]}
+    assert entry["result"] is None
+
+
+def test_audit_entry_violations(tmp_path):
+    """Test that violations are written to audit entries as objects."""
+    config = GatewayConfig()
+    config.logging.enabled = False
+    config.auditing.audit_log = tmp_path / "audit.jsonl"
+    logger = GatewayLogger(config)
+
+    (message,) = MessageParser().feed('{"jsonrpc": "2.0", "id": 1, "method": "ping"}\n')
+    violation = ScanViolation("aws-access-key", "critical", "block", "AWS key", "AKIA", 5, 9)
+    logger.audit("client->server", message, blocked=True, violations=[violation])
+    logger.flush()
+
+    entry = json.loads((tmp_path / "audit.jsonl").read_text())
+    assert entry["violations"] == [
+        {
+            "rule_name": "aws-access-key",
+            "severity": "critical",
+            "action": "block",
+            "description": "AWS key",
+            "match": "AKIA",
+            "match_start": 5,
+            "match_end": 9,
+        }
+    ]
+
+
+def test_audit_entries_buffered_until_flush(tmp_path, monkeypatch):
+    """Test that audit entries are written when flushed or when the buffer is full."""
+    config = GatewayConfig()
+    config.logging.enabled = False
+    config.auditing.audit_log = tmp_path / "audit.jsonl"
+    logger = GatewayLogger(config)
+    (message,) = MessageParser().feed('{"jsonrpc": "2.0", "method": "notifications/initialized"}\n')
+
+    logger.audit("client->server", message)
+    logger.audit("client->server", message)
+    assert not config.auditing.audit_log.exists()
+    logger.flush()
+    assert len(config.auditing.audit_log.read_text().splitlines()) == 2
+
+    # Every entry fills a one-byte buffer
+    monkeypatch.setattr(logger_module, "WRITE_BUFFER_SIZE", 1)
+    logger.audit("client->server", message)
+    assert len(config.auditing.audit_log.read_text().splitlines()) == 3
+
+    monkeypatch.setattr(logger_module, "WRITE_BUFFER_SIZE", 65536)
+    logger.audit("client->server", message)
+    logger.close()
+    assert len(config.auditing.audit_log.read_text().splitlines()) == 4
+
+
+def test_current_timestamp_reused_within_millisecond(monkeypatch):
+    """Test that timestamps are only formatted again once the millisecond changes."""
+    now = [1700000000.0001]
+    monkeypatch.setattr(logger_module.time, "time", lambda: now[0])
+    first = current_timestamp()
+    assert first == datetime.fromtimestamp(now[0]).isoformat()
+
+    now[0] = 1700000000.0009
+    assert current_timestamp() == first
+
+    now[0] = 1700000000.0012
+    assert current_timestamp() == datetime.fromtimestamp(now[0]).isoformat()
+
+
+def test_log_level_filter(tmp_path):
+    """Test that messages below the configured level are dropped."""
+    config = GatewayConfig()
+    config.logging.destination = tmp_path
+    config.logging.level = LogLevel.WARNING
+    config.auditing.enabled = False
+    logger = GatewayLogger(config)
+
+    logger.debug("debug message")
+    logger.info("info message")
+    logger.warning("warning message")
+    logger.error("error message")
+    logger.close()
+
+    lines = logger.log_file.read_text().splitlines()
+    assert [json.loads(line)["message"] for line in lines] == ["warning message", "error message"]
+    assert not logger.debug_enabled
+
+
+def test_set_level(tmp_path):
+    """Test that changing the level of a live logger changes what is logged."""
+    config = GatewayConfig()
+    config.logging.destination = tmp_path
+    config.logging.level = LogLevel.ERROR
+    config.auditing.enabled = False
+    logger = GatewayLogger(config)
+
+    logger.warning("dropped")
+    logger.set_level(LogLevel.DEBUG)
+    assert logger.debug_enabled
+    assert config.logging.level == LogLevel.DEBUG
+    logger.debug("kept")
+    logger.close()
+
+    lines = logger.log_file.read_text().splitlines()
+    assert [json.loads(line)["message"] for line in lines] == ["kept"]
+
+
+def test_summary_lists_top_tool_calls():
+    """Test that the summary shows the five most called tools, most called first."""
+    metrics = MetricsCollector(GatewayConfig())
+    metrics.metrics["tool_calls"].update({f"tool{i}": i for i in range(1, 9)})
+
+    summary = metrics.get_summary()
+
+    tools = summary.split("Top tool calls:\n")[1].splitlines()
+    assert tools == [f"  tool{i}: {i}" for i in range(8, 3, -1)]
+
+
+def test_text_log_format(tmp_path):
+    """Test the text log format."""
+    config = GatewayConfig()
+    config.logging.destination = tmp_path
+    config.logging.format = "text"
+    config.auditing.enabled = False
+    logger = GatewayLogger(config)
+
+    logger.warning("Security violation detected", rule="aws-access-key", action="block")
+    logger.info("Gateway shutting down")
+    logger.close()
+
+    lines = logger.log_file.read_text().splitlines()
+    assert lines[0].endswith(
+        "] WARNING: Security violation detected rule=aws-access-key action=block"
+    )
+    assert lines[1].endswith("] INFO: Gateway shutting down ")
+
+
+def test_violation_match_truncated(tmp_path):
+    """Test that long matches are cut short in violation log lines."""
+    config = GatewayConfig()
+    config.logging.destination = tmp_path
+    config.auditing.enabled = False
+    logger = GatewayLogger(config)
+    (message,) = MessageParser().feed('{"jsonrpc": "2.0", "id": 1, "method": "ping"}\n')
+
+    logger.log_violation("rule", "high", "alert", "x" * 50, message, "client->server")
+    logger.log_violation("rule", "high", "alert", "y" * 51, message, "client->server")
+    logger.close()
+
+    lines = logger.log_file.read_text().splitlines()
+    assert [json.loads(line)["match"] for line in lines] == ["x" * 50, "y" * 50 + "..."]
+
+
+def test_unclosed_logger_not_kept_alive(tmp_path):
+    """Test that a logger that is dropped unclosed is freed and writes its entries."""
+    config = GatewayConfig()
+    config.logging.enabled = False
+    config.auditing.audit_log = tmp_path / "audit.jsonl"
+    logger = GatewayLogger(config)
+    (message,) = MessageParser().feed('{"jsonrpc": "2.0", "method": "notifications/initialized"}\n')
+    logger.audit("client->server", message)
+    assert logger._audit_appender in logger_module._open_appenders
+
+    ref = weakref.ref(logger)
+    del logger
+    gc.collect()
+
+    assert ref() is None
+    assert len(config.auditing.audit_log.read_text().splitlines()) == 1
@@ -2,7 +2,7 @@
 
 import pytest
 
-from mcp_gateway.parser import MessageParser, MessageType
+from mcp_gateway.parser import JsonRpcRequest, MessageParser, MessageType
 
 
 def test_parse_request():
@@ -62,6 +62,37 @@ def test_parse_notification():
     assert parsed.message_id is None
 
 
+def test_parsed_data():
+    """Test building the typed payload on demand."""
+    parser = MessageParser()
+    message = '{"jsonrpc": "2.0", "id": 7, "method": "tools/call", "params": {"name": "echo"}}\n'
+
+    parsed = parser.feed(message)[0]
+
+    assert isinstance(parsed.parsed_data, JsonRpcRequest)
+    assert parsed.parsed_data.id == 7
+    assert parsed.parsed_data.params == {"name": "echo"}
+
+
+def test_invalid_envelope():
+    """Test rejecting messages with a malformed method or missing id."""
+    parser = MessageParser()
+
+    assert parser.feed('{"jsonrpc": "2.0", "id": 1, "method": 42}\n') == []
+    assert parser.feed('{"jsonrpc": "2.0", "result": {}}\n') == []
+
+
+def test_envelope_field_types():
+    """Test that ids and params are checked like the pydantic models would."""
+    parser = MessageParser()
+
+    assert parser.feed('{"jsonrpc": "2.0", "id": 2.0, "result": {}}\n')[0].message_id == 2
+    assert parser.feed('{"jsonrpc": "2.0", "id": "a", "result": {}}\n')[0].message_id == "a"
+    assert parser.feed('{"jsonrpc": "2.0", "id": 1.5, "result": {}}\n') == []
+    assert parser.feed('{"jsonrpc": "2.0", "id": [1], "result": {}}\n') == []
+    assert parser.feed('{"jsonrpc": "2.0", "method": "a", "params": "x"}\n') == []
+
+
 def test_parse_multiple_messages():
     """Test parsing multiple messages in one feed."""
     parser = MessageParser()
@@ -77,6 +108,22 @@ def test_parse_multiple_messages():
     assert messages[1].method == "test2"
 
 
+def test_messages_not_one_per_line():
+    """Test messages sharing a line or spread over several lines."""
+    parser = MessageParser()
+
+    messages = parser.feed(
+        '{"jsonrpc": "2.0", "id": 1, "method": "a"} {"jsonrpc": "2.0", "id": 2, "method": "b"}\n'
+        '{\n  "jsonrpc": "2.0",\n  "id": 3,\n  "method": "c"\n}\n'
+        '{"jsonrpc": "2.0", "id": 4, "method": "d"} \r\n'
+    )
+
+    assert [m.method for m in messages] == ["a", "b", "c", "d"]
+    assert messages[1].raw_message == '{"jsonrpc": "2.0", "id": 2, "method": "b"}'
+    assert messages[3].raw_message == '{"jsonrpc": "2.0", "id": 4, "method": "d"}'
+    assert parser.buffer == ""
+
+
 def test_parse_partial_message():
     """Test parsing partial messages with buffering."""
     parser = MessageParser()
@@ -125,3 +172,70 @@ def test_invalid_json():
     # Should return empty list or handle gracefully
     # The parser will keep buffering until it finds valid JSON
     assert isinstance(messages, list)
+
+
+def test_invalid_line_skipped():
+    """Test that a line that isn't valid JSON doesn't hold up the next message."""
+    parser = MessageParser()
+
+    messages = parser.feed('{invalid json}\n{"jsonrpc": "2.0", "id": 1, "method": "test"}\n')
+
+    assert [message.message_id for message in messages] == [1]
+    assert parser.buffer == ""
+
+
+def test_message_split_anywhere():
+    """Test that messages are found whichever way the data is split."""
+    message = (
+        '{"jsonrpc": "2.0", "id": 1, "method": "a}\\"{", "params": {"x": [1.5e3, true, null]}}\n'
+    )
+    for split in range(1, len(message)):
+        parser = MessageParser()
+        messages = parser.feed(message[:split]) + parser.feed(message[split:])
+        assert [m.method for m in messages] == ['a}"{'], split
+
+
+def test_partial_message_decoded_once_line_ends():
+    """Test that an incomplete message is only decoded again once its line ends."""
+    parser = MessageParser()
+    message = (
+        '{"jsonrpc": "2.0", "id": 1, "method": "test", "params": {"data": "' + "x" * 1000 + '"}}'
+    )
+
+    assert parser.feed(message[:10]) == []
+    for i in range(10, len(message), 10):
+        assert parser.feed(message[i : i + 10]) == []
+    assert parser.buffer == message[:10]
+
+    messages = parser.feed("\n")
+    assert [m.params["data"] for m in messages] == ["x" * 1000]
+    assert parser.buffer == ""
+
+
+def test_raw_message_not_kept():
+    """Test that a parser can be told not to keep the message text."""
+    parser = MessageParser(keep_raw=False)
+
+    (message,) = parser.feed('{"jsonrpc": "2.0", "id": 1, "method": "test"}\n')
+
+    assert message.raw_message is None
+    assert message.method == "test"
+
+
+def test_flush_parses_final_message(capsys):
+    """Test that a final message without its newline is parsed at the end of the stream."""
+    parser = MessageParser()
+    message = '{"jsonrpc": "2.0", "id": 1, "method": "test"}'
+
+    assert parser.feed(message[:10]) == []
+    assert parser.feed(message[10:]) == []
+    messages = parser.flush()
+    assert [m.raw_message for m in messages] == [message]
+    assert parser.buffer == ""
+    assert parser.flush() == []
+
+    # A message that is still incomplete is dropped
+    parser.feed('{"jsonrpc": "2.0", "id": 2, ')
+    assert parser.flush() == []
+    assert parser.buffer == ""
+    assert "incomplete message" in capsys.readouterr().err
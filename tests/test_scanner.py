@@ -1,10 +1,24 @@
 """Tests for security scanner."""
 
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
 import pytest
+from pydantic import ValidationError
 
-from mcp_gateway.config import ActionType, GatewayConfig, ScanRule, Severity
-from mcp_gateway.parser import MessageParser
-from mcp_gateway.scanner import SecurityScanner
+from mcp_gateway.config import (
+    DEFAULT_SCAN_RULES,
+    ActionType,
+    GatewayConfig,
+    ScanDirection,
+    ScanRule,
+    Severity,
+)
+from mcp_gateway.parser import MessageParser, create_error_response
+from mcp_gateway.prefilter import required_literals
+from mcp_gateway.scanner import NO_VIOLATIONS, AlertManager, SecurityScanner
 
 
 @pytest.fixture
@@ -55,6 +69,11 @@ def test_scan_no_violations(config):
     assert not result.should_block
     assert result.modified_message is None
 
+    # Clean scans share one result, which can't be changed
+    assert result is NO_VIOLATIONS
+    with pytest.raises(AttributeError):
+        result.should_block = True
+
 
 def test_scan_with_api_key(config):
     """Test scanning message with API key."""
@@ -69,9 +88,9 @@ def test_scan_with_api_key(config):
 
     assert result.has_violations()
     assert len(result.violations) == 1
-    assert result.violations[0]["rule_name"] == "test-api-key"
-    assert result.violations[0]["severity"] == "high"
-    assert result.violations[0]["action"] == "alert"
+    assert result.violations[0].rule_name == "test-api-key"
+    assert result.violations[0].severity == "high"
+    assert result.violations[0].action == "alert"
     assert not result.should_block  # ALERT doesn't block
 
 
@@ -89,8 +108,8 @@ def test_scan_with_password_blocks(config):
     assert result.has_violations()
     assert result.should_block
     violation = result.violations[0]
-    assert violation["rule_name"] == "test-password"
-    assert violation["action"] == "block"
+    assert violation.rule_name == "test-password"
+    assert violation.action == "block"
 
 
 def test_scan_with_redaction(config):
@@ -111,6 +130,30 @@ def test_scan_with_redaction(config):
     assert "MySecretValue" not in result.modified_message
 
 
+def test_redaction_replaces_each_match_once(config):
+    """Test that redaction replaces match spans, including overlapping ones."""
+    config.scanning.rules.append(
+        ScanRule(
+            name="test-redact-value",
+            pattern=r"Value-\d+",
+            action=ActionType.REDACT,
+            severity=Severity.MEDIUM,
+        )
+    )
+    scanner = SecurityScanner(config)
+    (parsed,) = MessageParser().feed(
+        '{"jsonrpc": "2.0", "id": 1, "method": "test", '
+        '"params": {"a": "SECRET: MyValue-42", "b": "SECRET: two"}}\n'
+    )
+
+    result = scanner.scan_message(parsed, "client->server")
+
+    assert result.modified_message == (
+        '{"jsonrpc": "2.0", "id": 1, "method": "test", '
+        '"params": {"a": "[REDACTED:test-redact]", "b": "[REDACTED:test-redact]"}}'
+    )
+
+
 def test_scan_multiple_violations(config):
     """Test scanning message with multiple violations."""
     scanner = SecurityScanner(config)
@@ -128,11 +171,31 @@ def test_scan_multiple_violations(config):
     assert result.has_violations()
     assert len(result.violations) == 2
 
-    rule_names = {v["rule_name"] for v in result.violations}
+    rule_names = {v.rule_name for v in result.violations}
     assert "test-api-key" in rule_names
     assert "test-email" in rule_names
 
 
+def test_scan_many_matches_of_one_rule(config):
+    """Test that every match of a rule is reported, in rule order and then text order."""
+    scanner = SecurityScanner(config)
+    emails = [f"user{i}@example.com" for i in range(50)]
+    text = "password: x " + " ".join(emails) + " SECRET: a SECRET: b"
+    (parsed,) = MessageParser().feed(json.dumps({"jsonrpc": "2.0", "id": 1, "result": text}) + "\n")
+
+    result = scanner.scan_message(parsed, "server->client")
+
+    assert [v.rule_name for v in result.violations] == (
+        ["test-password"] + ["test-email"] * 50 + ["test-redact"] * 2
+    )
+    assert [v.match for v in result.violations[1:51]] == emails
+    assert all(
+        parsed.raw_message[v.match_start : v.match_end] == v.match for v in result.violations
+    )
+    assert result.should_block
+    assert result.modified_message.count("[REDACTED:test-redact]") == 2
+
+
 def test_scan_direction_filtering(config):
     """Test that scanning respects direction settings."""
     config.scanning.scan_request = True
@@ -154,6 +217,21 @@ def test_scan_direction_filtering(config):
     assert result.has_violations()
 
 
+def test_rule_direction(config):
+    """Test that a rule limited to one direction is not applied to the other."""
+    for rule in config.scanning.rules:
+        rule.direction = ScanDirection.RESPONSE
+    scanner = SecurityScanner(config)
+    (parsed,) = MessageParser().feed(
+        '{"jsonrpc": "2.0", "id": 1, "method": "test", "params": {"data": "password: abc"}}\n'
+    )
+
+    assert not scanner.scan_message(parsed, "client->server").has_violations()
+    assert scanner.scan_message(parsed, "server->client").should_block
+    assert not scanner.scans_direction("client->server")
+    assert scanner.scans_direction("server->client")
+
+
 def test_create_block_response(config):
     """Test creating a block response."""
     scanner = SecurityScanner(config)
@@ -179,6 +257,39 @@ def test_create_block_response(config):
     assert "security policy" in error_data["error"]["message"].lower()
 
 
+@pytest.mark.parametrize("request_id", [7, 'req-"1"-\u00e9', None])
+def test_block_response_matches_error_response(config, request_id):
+    """Test that the assembled block response equals create_error_response()."""
+    scanner = SecurityScanner(config)
+    message = MessageParser().parse_message(
+        json.dumps(
+            {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "method": "test",
+                "params": {"a": "password: one", "b": "PASSWORD: two"},
+            }
+        )
+    )
+    result = scanner.scan_message(message, "client->server")
+    assert len(result.violations) == 2
+
+    expected = create_error_response(
+        request_id=request_id,
+        code=-32000,
+        message="Request blocked by security policy",
+        data={
+            "reason": "Security violations detected",
+            "violations": [
+                {"rule": "test-password", "severity": "critical", "description": ""},
+            ]
+            * 2,
+            "contact": "Contact your administrator for more information",
+        },
+    )
+    assert scanner.create_block_response(message, result) == expected
+
+
 def test_scan_text(config):
     """Test scanning arbitrary text."""
     scanner = SecurityScanner(config)
@@ -191,3 +302,166 @@ def test_scan_text(config):
     rule_names = {rule.name for rule, _ in violations}
     assert "test-api-key" in rule_names
     assert "test-email" in rule_names
+
+
+def test_hyperscan_prefilter_matches_re(config):
+    """Test that the Hyperscan prefilter finds the same violations as re alone."""
+    pytest.importorskip("hyperscan")
+    scanner = SecurityScanner(config)
+    assert scanner._hs_db is not None
+
+    text = (
+        "key sk-1234567890abcdefghijklmnopqrstuvwxyz, mail user@test.com, "
+        "PASSWORD: hunter2, SECRET: abc"
+    )
+    with_hyperscan = scanner.scan_text(text)
+    assert len(with_hyperscan) == 4
+    assert scanner.scan_text("nothing to see here") == []
+
+    # Text where Hyperscan's \s and \w differ from re's
+    for other in ("password:\x1chunter2", "password: \u0560"):
+        assert [rule.name for rule, _ in scanner.scan_text(other)] == ["test-password"]
+
+    scanner._hs_db = None
+    assert scanner.scan_text(text) == with_hyperscan
+
+
+def test_hyperscan_database_shared(config):
+    """Test that scanners with the same rules reuse one compiled Hyperscan database."""
+    pytest.importorskip("hyperscan")
+    assert SecurityScanner(config)._hs_db is SecurityScanner(config)._hs_db
+
+
+def test_overlapping_matches_of_different_rules():
+    """Test that a match inside another rule's match is reported for both rules."""
+    config = GatewayConfig()
+    config.scanning.rules = DEFAULT_SCAN_RULES
+    scanner = SecurityScanner(config)
+
+    violations = scanner.scan_text("key ctx7sk-" + "a1b2" * 10)
+
+    assert [rule.name for rule, _ in violations] == ["openai-api-key", "context7-api-key"]
+
+
+def test_default_email_rule_on_hostile_text():
+    """Test that text built to look like a huge email address scans quickly."""
+    config = GatewayConfig()
+    config.scanning.rules = DEFAULT_SCAN_RULES
+    scanner = SecurityScanner(config)
+
+    # Took about 14 s before the address parts were length capped
+    start = time.perf_counter()
+    assert scanner.scan_text("a." * 50000 + "@") == []
+    assert time.perf_counter() - start < 1
+
+    # Addresses over the SMTP length limits aren't reported
+    text = "mail first.last+tag@sub.example.co.uk or " + "a" * 65 + "@example.com"
+    assert [match for _, match in scanner.scan_text(text)] == ["first.last+tag@sub.example.co.uk"]
+
+
+def test_invalid_rule_pattern_rejected():
+    """Test that an invalid rule pattern fails when the rule is loaded."""
+    with pytest.raises(ValidationError):
+        ScanRule(name="broken", pattern="sk-[a-z")
+
+
+def test_digit_rules():
+    """Test the SSN and credit card rules, which are prefiltered by digit shape."""
+    config = GatewayConfig()
+    config.scanning.rules = DEFAULT_SCAN_RULES
+    scanner = SecurityScanner(config)
+
+    def rule_names(text):
+        return {rule.name for rule, _ in scanner.scan_text(text)}
+
+    assert rule_names("ssn 123-45-6789, card 4111 1111-11111111") == {"ssn", "credit-card"}
+    assert rule_names("released 2024-01-05, build 123456789") == set()
+    # Non-ASCII text skips the prefilter but is still scanned
+    assert rule_names("caf\u00e9 123-45-6789") == {"ssn"}
+    # \s also matches the ASCII separators \x1c-\x1f
+    for separator in "\x1c\x1d\x1e\x1f":
+        card = separator.join(["4111"] * 4)
+        assert rule_names(f"card {card}") == {"credit-card"}
+        assert scanner.may_match(f"card {card}")
+
+
+def test_required_literals():
+    """Test extracting the literals every match of a pattern must contain."""
+    assert required_literals(r"AKIA[0-9A-Z]{16}") == ["akia"]
+    assert required_literals(r"gh[ps]_[a-zA-Z0-9]{36,}") == ["ghp_", "ghs_"]
+    assert required_literals(r"\b[a-z]+@[a-z]+\.[a-z]{2,}\b") == ["@"]
+    assert required_literals(r"(?:foo|bar)\d+") is None
+    assert required_literals(r"\d{4}[-\s]?\d{4}") is None
+
+
+def test_literal_prefilter_matches_re(config):
+    """Test that the literal prefilter finds the same violations as re alone."""
+    scanner = SecurityScanner(config)
+    scanner._hs_db = None
+    texts = [
+        "key SK-1234567890ABCDEFGHIJKLMNOPQRSTUVWXYZ, Password: hunter2",
+        "mail user@test.com, secret: abc",
+        # Non-ASCII text is not prefiltered: the long s matches "s"
+        "\u017fk-1234567890abcdefghijklmnopqrstuvwxyz",
+        "nothing to see here",
+    ]
+    with_prefilter = [scanner.scan_text(text) for text in texts]
+    assert [len(violations) for violations in with_prefilter] == [2, 2, 1, 0]
+
+    scanner._literal_filter = None
+    scanner._candidate_rules = lambda text, direction=None: scanner.compiled_rules
+    assert [scanner.scan_text(text) for text in texts] == with_prefilter
+
+
+def test_may_match_rules_out_joined_messages(config):
+    """Test that may_match() is only False when no joined message has a violation."""
+    scanner = SecurityScanner(config)
+    messages = MessageParser().feed(
+        '{"jsonrpc": "2.0", "id": 1, "result": "nothing to see here"}\n'
+        '{"jsonrpc": "2.0", "id": 2, "result": "mail user@test.com"}\n'
+    )
+
+    assert not scanner.may_match(messages[0].raw_message, "server->client")
+    joined = "\n".join(message.raw_message for message in messages)
+    assert scanner.may_match(joined, "server->client")
+    assert scanner.scan_message(messages[1], "server->client").has_violations()
+
+
+def test_webhook_alerts_share_connection(config):
+    """Test that webhook alerts are posted in the background over one connection."""
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            received.append((self.client_address, json.loads(body)))
+            self.send_response(204)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        config.alerting.enabled = True
+        config.alerting.webhook_url = f"http://127.0.0.1:{server.server_port}/alerts"
+        alert_manager = AlertManager(config)
+        scanner = SecurityScanner(config)
+        (parsed,) = MessageParser().feed(
+            '{"jsonrpc": "2.0", "id": 1, "method": "test", "params": {"data": "password: abc"}}\n'
+        )
+        result = scanner.scan_message(parsed, "client->server")
+
+        for _ in range(3):
+            alert_manager.send_alert(parsed, result, "client->server", server_name="mock")
+        alert_manager.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert [alert["violations"][0]["rule_name"] for _, alert in received] == ["test-password"] * 3
+    assert len({address for address, _ in received}) == 1